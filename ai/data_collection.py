@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from utils.database import get_db_connection
+from config import Config
 
 class VillainDataset:
     def __init__(self):
@@ -31,10 +32,14 @@ class VillainDataset:
                 FROM orders o
                 JOIN restaurants r ON o.restaurant_id = r.id
                 WHERE o.status = 'delivered'
+                  AND o.created_at >= DATE('now', ?)
                 GROUP BY DATE(o.created_at), r.id, r.cuisine_type
                 ORDER BY date DESC
             """
-            self.sales_data = pd.read_sql(sales_query, conn)
+            # Window the aggregation so memory scales with the training
+            # horizon instead of full order history
+            window = f"-{Config.AI_TRAINING_WINDOW_DAYS} days"
+            self.sales_data = self._query_to_frame(conn, sales_query, (window,))
             
             # User interactions for recommendations
             interactions_query = """
@@ -52,10 +57,12 @@ class VillainDataset:
                 JOIN menu_items mi ON oi.menu_item_id = mi.id
                 JOIN restaurants r ON mi.restaurant_id = r.id
                 WHERE o.status = 'delivered'
+                  AND o.created_at >= DATE('now', '-365 days')
                 GROUP BY u.id, oi.menu_item_id, mi.name, mi.category, mi.price, r.cuisine_type
             """
-            self.user_interactions = pd.read_sql(interactions_query, conn)
-            
+            self.user_interactions = self._query_to_frame(conn, interactions_query)
+
+            self._categorize_frames()
             return self.sales_data, self.user_interactions, None
             
         except Exception as e:
@@ -63,7 +70,35 @@ class VillainDataset:
             return None, None, None
         finally:
             conn.close()
-    
+
+    @staticmethod
+    def _query_to_frame(conn, query, params=()):
+        """Run a query and build a DataFrame from the bulk-fetched rows.
+
+        Bypasses pd.read_sql's row-at-a-time DBAPI iteration: fetchall pulls
+        every row in one C-level call and from_records builds the columns
+        without boxing each cell through a Python-object round trip.
+        """
+        cursor = conn.execute(query, params)
+        rows = cursor.fetchall()
+        columns = [description[0] for description in cursor.description]
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+    def _categorize_frames(self):
+        """Store low-cardinality string columns as categoricals.
+
+        Downstream groupbys then hash integer codes instead of Python
+        strings, and frame copies stop duplicating object pointers.
+        """
+        if self.sales_data is not None:
+            for col in ('restaurant_name', 'cuisine_type'):
+                if col in self.sales_data.columns:
+                    self.sales_data[col] = self.sales_data[col].astype('category')
+        if self.user_interactions is not None:
+            for col in ('item_name', 'item_category', 'cuisine_type'):
+                if col in self.user_interactions.columns:
+                    self.user_interactions[col] = self.user_interactions[col].astype('category')
+
     def generate_sample_data(self):
         """Generate sample data for demonstration"""
         np.random.seed(42)
@@ -80,48 +115,65 @@ class VillainDataset:
         start_date = datetime(2024, 1, 1)
         end_date = datetime(2024, 3, 31)
         date_range = pd.date_range(start_date, end_date, freq='D')
-        
-        sales_records = []
-        for date in date_range:
-            for restaurant_id in range(1, 7):  # 6 restaurants
-                # Base sales with day-of-week and seasonal patterns
-                base_sales = 50 + (restaurant_id * 10)
-                day_multiplier = 1.2 if date.weekday() >= 5 else 1.0  # Weekend boost
-                
-                order_count = max(1, int(np.random.poisson(8 * day_multiplier)))
-                total_sales = max(20, np.random.normal(base_sales * day_multiplier, 15))
-                
-                sales_records.append({
-                    'date': date,
-                    'restaurant_id': restaurant_id,
-                    'restaurant_name': restaurants[restaurant_id - 1],
-                    'cuisine_type': cuisines[(restaurant_id - 1) % len(cuisines)],
-                    'day_of_week': date.weekday(),
-                    'month': date.month,
-                    'order_count': order_count,
-                    'total_sales': total_sales,
-                    'avg_order_value': total_sales / order_count
-                })
-        
-        self.sales_data = pd.DataFrame(sales_records)
-        
-        # Generate user interactions
-        user_interactions = []
-        for user_id in range(1, 51):  # 50 users
-            for _ in range(np.random.randint(5, 15)):  # 5-15 interactions per user
-                item_id = np.random.randint(1, 31)  # 30 menu items
-                order_count = np.random.randint(1, 4)
-                
-                user_interactions.append({
-                    'user_id': user_id,
-                    'item_id': item_id,
-                    'item_name': f'Menu Item {item_id}',
-                    'item_category': np.random.choice(['Main', 'Appetizer', 'Dessert', 'Drink']),
-                    'price': np.random.uniform(5, 25),
-                    'cuisine_type': np.random.choice(cuisines),
-                    'order_count': order_count
-                })
-        
-        self.user_interactions = pd.DataFrame(user_interactions)
-        
+
+        # Build the date x restaurant cross product as flat arrays so every
+        # random draw happens in a single vectorized call instead of per row
+        restaurant_ids = np.arange(1, 7)  # 6 restaurants
+        n_days = len(date_range)
+        n_restaurants = len(restaurant_ids)
+        n_rows = n_days * n_restaurants
+
+        dates = np.repeat(date_range.values, n_restaurants)
+        rest_ids = np.tile(restaurant_ids, n_days)
+        day_of_week = np.repeat(date_range.dayofweek.values, n_restaurants)
+        months = np.repeat(date_range.month.values, n_restaurants)
+
+        # Base sales with day-of-week and seasonal patterns
+        base_sales = 50 + (rest_ids * 10)
+        day_multiplier = np.where(day_of_week >= 5, 1.2, 1.0)  # Weekend boost
+
+        order_count = np.maximum(1, np.random.poisson(8 * day_multiplier, size=n_rows))
+        total_sales = np.maximum(20, np.random.normal(base_sales * day_multiplier, 15, size=n_rows))
+
+        restaurant_names = np.array(restaurants)
+        cuisine_lookup = np.array([cuisines[(rid - 1) % len(cuisines)] for rid in restaurant_ids])
+
+        self.sales_data = pd.DataFrame({
+            'date': dates,
+            'restaurant_id': rest_ids,
+            'restaurant_name': np.take(restaurant_names, rest_ids - 1),
+            'cuisine_type': np.take(cuisine_lookup, rest_ids - 1),
+            'day_of_week': day_of_week,
+            'month': months,
+            'order_count': order_count,
+            'total_sales': total_sales,
+            'avg_order_value': total_sales / order_count
+        })
+
+        # Generate user interactions: draw every user's interaction count
+        # up front, then all item attributes in one batch
+        interaction_counts = np.random.randint(5, 15, size=50)  # 5-15 interactions per user
+        n_interactions = interaction_counts.sum()
+
+        user_ids = np.repeat(np.arange(1, 51), interaction_counts)  # 50 users
+        item_ids = np.random.randint(1, 31, size=n_interactions)  # 30 menu items
+
+        # Draw integer indices and fan out through precomputed string arrays;
+        # cheaper than sampling the string lists directly
+        categories = np.array(['Main', 'Appetizer', 'Dessert', 'Drink'])
+        cuisine_pool = np.array(cuisines)
+        category_idx = np.random.randint(0, len(categories), size=n_interactions)
+        cuisine_idx = np.random.randint(0, len(cuisine_pool), size=n_interactions)
+
+        self.user_interactions = pd.DataFrame({
+            'user_id': user_ids,
+            'item_id': item_ids,
+            'item_name': np.char.add('Menu Item ', item_ids.astype(str)),
+            'item_category': categories[category_idx],
+            'price': np.random.uniform(5, 25, size=n_interactions),
+            'cuisine_type': cuisine_pool[cuisine_idx],
+            'order_count': np.random.randint(1, 4, size=n_interactions)
+        })
+
+        self._categorize_frames()
         return self.sales_data, self.user_interactions, None
\ No newline at end of file
@@ -2,27 +2,81 @@
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split, learning_curve
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error
-from sklearn.preprocessing import LabelEncoder, StandardScaler
 import plotly.express as px
 from datetime import datetime, timedelta
-import pickle
+import joblib
 import os
+import threading
+import time
+from collections import OrderedDict
 from ai.model_evaluation import ModelEvaluator
 from utils.database import get_db_connection
 from config import Config
 
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, maxsize=256, ttl=60.0):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (ttl or self.ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Shared across workers' repeated hits on the same restaurant/user keys
+_prediction_cache = _TTLCache(maxsize=256, ttl=60.0)
+
+
+def invalidate_prediction_cache():
+    """Drop cached forecasts/recommendations after new orders or reviews."""
+    _prediction_cache.clear()
+
+
 class VillainAI:
     """AI module for sales predictions and recommendations"""
 
+    FEATURE_COLS = (
+        'restaurant_id', 'day_of_week', 'month', 'is_weekend',
+        'is_holiday_season', 'cuisine_encoded'
+    )
+
     def __init__(self):
         self.sales_model = None
-        self.scaler = StandardScaler()
         self.is_trained = False
         self.model_evaluator = ModelEvaluator()
         self.model_path = Config.AI_MODEL_PATH
+        self._prepared_cache = None
+        self._cuisine_codes = None
+        self._restaurant_cuisine = None
+        self._model_mtime = None
         self._load_model()
 
     # ---------------------------
@@ -30,16 +84,51 @@ class VillainAI:
     # ---------------------------
     def prepare_sales_features(self, df):
         """Prepare features for sales prediction"""
+        # Reuse the last prepared frame when the same input is passed again
+        # (training and accuracy analysis both prep the same data per
+        # request). Identity check on the frame itself -- keeping the
+        # source referenced in the cache means its id can never be
+        # recycled for a different frame
+        if self._prepared_cache is not None and self._prepared_cache[0] is df:
+            return self._prepared_cache[1]
+
+        source = df
         df = df.copy()
-        df['date'] = pd.to_datetime(df['date'])
-        df['day_of_week'] = df['date'].dt.dayofweek
-        df['month'] = df['date'].dt.month
-        df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
-        df['is_holiday_season'] = df['month'].isin([11, 12]).astype(int)
-
-        # Encode categorical variables
-        le_cuisine = LabelEncoder()
-        df['cuisine_encoded'] = le_cuisine.fit_transform(df['cuisine_type'])
+        if not np.issubdtype(df['date'].dtype, np.datetime64):
+            df['date'] = pd.to_datetime(df['date'])
+
+        # Derive the calendar features from numpy arrays so each column is
+        # one vectorized pass with no intermediate Series
+        dow = df['date'].dt.dayofweek.to_numpy()
+        mon = df['date'].dt.month.to_numpy()
+        df['day_of_week'] = dow
+        df['month'] = mon
+        df['is_weekend'] = (dow >= 5).astype(np.int8)
+        df['is_holiday_season'] = ((mon == 11) | (mon == 12)).astype(np.int8)
+
+        # Encode categorical variables through the persistent cuisine table;
+        # build it once from the data at hand if training hasn't snapshot it yet
+        cuisine = df['cuisine_type']
+        if self._cuisine_codes is None:
+            if isinstance(cuisine.dtype, pd.CategoricalDtype):
+                vocabulary = cuisine.cat.categories
+            else:
+                vocabulary = sorted(cuisine.unique())
+            self._cuisine_codes = {c: i for i, c in enumerate(vocabulary)}
+        if isinstance(cuisine.dtype, pd.CategoricalDtype):
+            # Look up only the handful of categories, then expand through the
+            # integer codes; the trailing -1 slot catches missing values
+            category_codes = np.array(
+                [self._cuisine_codes.get(c, -1) for c in cuisine.cat.categories] + [-1],
+                dtype='int32'
+            )
+            df['cuisine_encoded'] = category_codes[cuisine.cat.codes]
+        else:
+            df['cuisine_encoded'] = (
+                cuisine.map(self._cuisine_codes).fillna(-1).astype('int32')
+            )
+
+        self._prepared_cache = (source, df)
         return df
 
     # ---------------------------
@@ -48,34 +137,49 @@ class VillainAI:
     def train_sales_predictor(self, sales_data):
         """Train the sales prediction model"""
         try:
+            # Snapshot the cuisine vocabulary seen at training time so later
+            # predictions map to the same stable codes. The prepared-frame
+            # cache must go too: a cached hit would return features encoded
+            # under the old vocabulary and skip rebuilding it entirely
+            self._cuisine_codes = None
+            self._prepared_cache = None
             df = self.prepare_sales_features(sales_data)
-            feature_cols = [
-                'restaurant_id', 'day_of_week', 'month', 'is_weekend',
-                'is_holiday_season', 'cuisine_encoded'
-            ]
-            X = df[feature_cols]
+            # Each restaurant's cuisine is constant, so remember it here and
+            # spare predict_future_sales a DB lookup per request
+            self._restaurant_cuisine = dict(
+                zip(df['restaurant_id'], df['cuisine_type'])
+            )
+            X = df[list(self.FEATURE_COLS)]
             y = df['total_sales']
 
-            valid_indices = X.notna().all(axis=1)
-            X = X[valid_indices]
-            y = y[valid_indices]
+            # All features are synthesized from non-null sources except
+            # cuisine_encoded, which maps unseen cuisines to -1
+            valid = (df['cuisine_encoded'] >= 0) & y.notna()
+            if not valid.all():
+                X = X[valid]
+                y = y[valid]
 
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y, test_size=0.2, random_state=42
             )
 
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
-
-            self.sales_model = RandomForestRegressor(
-                n_estimators=100, max_depth=10, random_state=42
+            # Histogram gradient boosting bins the 6 integer features once
+            # and fits shallow trees on the histograms -- much faster than a
+            # 100-tree forest on this data, and a far smaller saved model
+            self.sales_model = HistGradientBoostingRegressor(
+                max_iter=200, max_depth=8, learning_rate=0.05,
+                random_state=42, early_stopping=True
             )
-            self.sales_model.fit(X_train_scaled, y_train)
+            self.sales_model.fit(X_train, y_train)
 
-            y_pred = self.sales_model.predict(X_test_scaled)
+            y_pred = self.sales_model.predict(X_test)
             mae = mean_absolute_error(y_test, y_pred)
             rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-            feature_importance = dict(zip(feature_cols, self.sales_model.feature_importances_))
+            permutation = permutation_importance(
+                self.sales_model, X_test, y_test,
+                n_repeats=5, random_state=42
+            )
+            feature_importance = dict(zip(self.FEATURE_COLS, permutation.importances_mean))
 
             self.is_trained = True
             
@@ -94,11 +198,13 @@ class VillainAI:
             os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
             model_data = {
                 'model': self.sales_model,
-                'scaler': self.scaler,
-                'is_trained': self.is_trained
+                'is_trained': self.is_trained,
+                'cuisine_codes': self._cuisine_codes,
+                'restaurant_cuisine': self._restaurant_cuisine
             }
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(model_data, f)
+            # joblib serializes the forest's numpy arrays natively instead of
+            # through pickle's generic path, and compresses the payload
+            joblib.dump(model_data, self.model_path, compress=3)
             print(f"Model saved to {self.model_path}")
         except Exception as e:
             print(f"Error saving model: {e}")
@@ -107,63 +213,73 @@ class VillainAI:
         """Load trained model from disk"""
         try:
             if os.path.exists(self.model_path):
-                with open(self.model_path, 'rb') as f:
-                    model_data = pickle.load(f)
-                    self.sales_model = model_data['model']
-                    self.scaler = model_data['scaler']
-                    self.is_trained = model_data.get('is_trained', False)
+                model_data = joblib.load(self.model_path)
+                self.sales_model = model_data['model']
+                self.is_trained = model_data.get('is_trained', False)
+                self._cuisine_codes = model_data.get('cuisine_codes')
+                self._restaurant_cuisine = model_data.get('restaurant_cuisine')
+                self._model_mtime = os.path.getmtime(self.model_path)
                 print(f"Model loaded from {self.model_path}")
         except Exception as e:
             print(f"Error loading model: {e}")
             self.is_trained = False
 
+    def _maybe_reload_model(self):
+        """Pick up a model saved by another worker since the last load."""
+        try:
+            if os.path.exists(self.model_path):
+                mtime = os.path.getmtime(self.model_path)
+                if self._model_mtime is None or mtime > self._model_mtime:
+                    self._load_model()
+        except OSError:
+            pass
+
     # ---------------------------
     # FUTURE SALES PREDICTION
     # ---------------------------
     def predict_future_sales(self, restaurant_id, days=7):
         """Predict sales for the next N days"""
+        if not self.is_trained or self.sales_model is None:
+            self._maybe_reload_model()
         if not self.is_trained or self.sales_model is None:
             return []
 
+        cache_key = ('forecast', restaurant_id, days)
+        cached = _prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            predictions = []
             today = datetime.now()
 
-            # Get restaurant info
-            conn = get_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM restaurants WHERE id = %s", (restaurant_id,))
-                restaurant = cursor.fetchone()
-                cursor.close()
-                conn.close()
-            else:
-                restaurant = {'cuisine_type': 'Burger'}
-
-            le_cuisine = LabelEncoder()
-            le_cuisine.fit([restaurant['cuisine_type']])
-            cuisine_encoded = le_cuisine.transform([restaurant['cuisine_type']])[0]
-
-            for i in range(days):
-                date = today + timedelta(days=i+1)
-                features = pd.DataFrame([{
-                    'restaurant_id': restaurant_id,
-                    'day_of_week': date.weekday(),
-                    'month': date.month,
-                    'is_weekend': int(date.weekday() >= 5),
-                    'is_holiday_season': int(date.month in [11, 12]),
-                    'cuisine_encoded': cuisine_encoded
-                }])
-                scaled_features = self.scaler.transform(features)
-                predicted_sales = self.sales_model.predict(scaled_features)[0]
-                predictions.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'day_name': date.strftime('%A'),
-                    'predicted_sales': max(0, round(predicted_sales, 2)),
-                    'restaurant_id': restaurant_id
-                })
-
-            return predictions
+            # Cuisine per restaurant was captured at training time, so no
+            # DB round-trip is needed here
+            restaurant_cuisine = self._restaurant_cuisine or {}
+            cuisine = restaurant_cuisine.get(restaurant_id, 'Burger')
+            cuisine_codes = self._cuisine_codes or {}
+            cuisine_encoded = cuisine_codes.get(cuisine, -1)
+
+            # Build the full forecast window as one feature matrix so the
+            # model walks its trees once instead of once per day
+            dates = [today + timedelta(days=i + 1) for i in range(days)]
+            features = pd.DataFrame({
+                'restaurant_id': restaurant_id,
+                'day_of_week': [d.weekday() for d in dates],
+                'month': [d.month for d in dates],
+                'is_weekend': [int(d.weekday() >= 5) for d in dates],
+                'is_holiday_season': [int(d.month in [11, 12]) for d in dates],
+                'cuisine_encoded': cuisine_encoded
+            })
+            predicted_sales = self.sales_model.predict(features)
+
+            forecast = [{
+                'date': date.strftime('%Y-%m-%d'),
+                'day_name': date.strftime('%A'),
+                'predicted_sales': max(0, round(float(sales), 2)),
+                'restaurant_id': restaurant_id
+            } for date, sales in zip(dates, predicted_sales)]
+            _prediction_cache.set(cache_key, forecast)
+            return forecast
 
         except Exception as e:
             print(f"Prediction error: {e}")
@@ -174,6 +290,11 @@ class VillainAI:
     # ---------------------------
     def get_popular_recommendations(self, user_id=None, top_n=5):
         """Return top N popular menu items"""
+        cache_key = ('recommendations', user_id, top_n)
+        cached = _prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             conn = get_db_connection()
             if conn:
@@ -188,10 +309,13 @@ class VillainAI:
                     ORDER BY order_count DESC
                     LIMIT ?
                 """, (top_n,))
-                items = cursor.fetchall()
+                items = cursor.fetchmany(top_n)
                 cursor.close()
                 conn.close()
                 if items:
+                    # Popularity is a slow-moving global aggregate: keep it
+                    # for 10 minutes; order/review commits invalidate early
+                    _prediction_cache.set(cache_key, items, ttl=600.0)
                     return items
             # Fallback to synthetic recommendations
             sample_items = []
@@ -217,12 +341,10 @@ class VillainAI:
 
         df = sales_data.copy()
         df['date'] = pd.to_datetime(df['date'])
+        # Sort once so every groupby below takes pandas' ordered fast path
+        df = df.sort_values('date', kind='mergesort', ignore_index=True)
 
-        trend = (
-            df.groupby('date')['total_sales']
-            .sum()
-            .reset_index()
-        )
+        trend = df.groupby('date', sort=False, as_index=False)['total_sales'].sum()
         trend_chart = px.line(
             trend,
             x='date',
@@ -232,9 +354,8 @@ class VillainAI:
         )
 
         cuisine = (
-            df.groupby('cuisine_type')['total_sales']
+            df.groupby('cuisine_type', sort=False, observed=True, as_index=False)['total_sales']
             .sum()
-            .reset_index()
             .sort_values('total_sales', ascending=False)
         )
         cuisine_chart = px.bar(
@@ -246,15 +367,16 @@ class VillainAI:
             template='plotly_dark'
         )
 
-        heatmap_df = df.copy()
-        heatmap_df['day_of_week_name'] = heatmap_df['date'].dt.day_name()
-        heatmap = (
-            heatmap_df
-            .groupby(['day_of_week_name', 'month'])['total_sales']
-            .sum()
-            .reset_index()
-            .pivot(index='day_of_week_name', columns='month', values='total_sales')
-            .fillna(0)
+        # Single pivot_table fuses the group + reshape + fill without
+        # copying the frame first
+        day_names = df['date'].dt.day_name()
+        months = df['date'].dt.month
+        heatmap = df.pivot_table(
+            index=day_names,
+            columns=months,
+            values='total_sales',
+            aggfunc='sum',
+            fill_value=0
         )
         dow_chart = px.imshow(
             heatmap.values,
@@ -267,7 +389,7 @@ class VillainAI:
 
         return trend_chart, cuisine_chart, dow_chart
 
-    def analyze_model_accuracy(self, sales_data):
+    def analyze_model_accuracy(self, sales_data, include_learning_curve=False):
         """Return accuracy, error metrics, and saturation levels."""
         baseline = {
             'mae': None,
@@ -283,66 +405,53 @@ class VillainAI:
             return baseline
 
         df = self.prepare_sales_features(sales_data)
-        feature_cols = [
-            'restaurant_id', 'day_of_week', 'month', 'is_weekend',
-            'is_holiday_season', 'cuisine_encoded'
-        ]
-        X = df[feature_cols]
+        X = df[list(self.FEATURE_COLS)]
         y = df['total_sales']
 
         if X.empty or y.empty:
             return baseline
 
-        X_scaled = self.scaler.fit_transform(X)
-
+        # Reuse the already-trained model rather than re-fitting fresh
+        # estimators on every dashboard request
         if not self.is_trained:
             self.train_sales_predictor(sales_data)
+        if not self.is_trained or self.sales_model is None:
+            return baseline
 
-        if len(df) < 30:
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
-            model.fit(X_scaled, y)
-            y_pred = model.predict(X_scaled)
-            mae = mean_absolute_error(y, y_pred)
-            rmse = np.sqrt(mean_squared_error(y, y_pred))
-            mean_sales = max(y.mean(), 1)
-            accuracy = max(0.0, 1 - (rmse / mean_sales))
-            self.model_evaluator.evaluate_sales_model(y, y_pred, model_name="Villain Sales RF (small)")
-            return {
-                'mae': float(mae),
-                'rmse': float(rmse),
-                'accuracy': float(accuracy),
-                'samples_used': int(len(df)),
-                'saturation_point': len(df),
-                'train_sizes': [len(df)],
-                'validation_rmse': [float(rmse)]
-            }
-
-        model = RandomForestRegressor(n_estimators=150, random_state=42, max_depth=12)
-        train_sizes, train_scores, test_scores = learning_curve(
-            model,
-            X_scaled,
-            y,
-            cv=3,
-            train_sizes=np.linspace(0.2, 1.0, 5),
-            scoring='neg_mean_squared_error'
-        )
-
-        model.fit(X_scaled, y)
-        y_pred = model.predict(X_scaled)
+        y_pred = self.sales_model.predict(X)
         mae = mean_absolute_error(y, y_pred)
         rmse = np.sqrt(mean_squared_error(y, y_pred))
         mean_sales = max(y.mean(), 1)
         accuracy = max(0.0, 1 - (rmse / mean_sales))
 
-        # Determine saturation point where improvement < 2%
-        val_rmse = np.sqrt(-test_scores)
-        accuracy_curve = 1 - (val_rmse / mean_sales)
-        saturation_point = int(train_sizes[-1])
-        for idx in range(1, len(accuracy_curve)):
-            improvement = (accuracy_curve[idx] - accuracy_curve[idx-1]) * 100
-            if improvement < 2.0:
-                saturation_point = int(train_sizes[idx])
-                break
+        saturation_point = int(len(df))
+        train_sizes_list = [len(df)]
+        val_rmse_list = [float(rmse)]
+
+        if include_learning_curve and len(df) >= 30:
+            # One fitted booster yields the whole curve: staged_predict
+            # replays the ensemble stage by stage, so no extra fits at all
+            stage_rmse = np.array([
+                np.sqrt(mean_squared_error(y, stage_pred))
+                for stage_pred in self.sales_model.staged_predict(X)
+            ])
+            stages = np.arange(1, len(stage_rmse) + 1)
+
+            # Thin the curve to ~10 points for the dashboard
+            step = max(1, len(stage_rmse) // 10)
+            stages = stages[::step]
+            val_rmse = stage_rmse[::step]
+
+            # Determine saturation point where improvement < 2%
+            accuracy_curve = 1 - (val_rmse / mean_sales)
+            saturation_point = int(stages[-1])
+            for idx in range(1, len(accuracy_curve)):
+                improvement = (accuracy_curve[idx] - accuracy_curve[idx-1]) * 100
+                if improvement < 2.0:
+                    saturation_point = int(stages[idx])
+                    break
+            train_sizes_list = stages.tolist()
+            val_rmse_list = val_rmse.tolist()
 
         self.model_evaluator.evaluate_sales_model(y, y_pred, model_name="Villain Sales RF")
 
@@ -352,13 +461,20 @@ class VillainAI:
             'accuracy': float(accuracy),
             'samples_used': int(len(df)),
             'saturation_point': saturation_point,
-            'train_sizes': train_sizes.tolist(),
-            'validation_rmse': val_rmse.tolist()
+            'train_sizes': train_sizes_list,
+            'validation_rmse': val_rmse_list
         }
 
 # ---------------------------
 # HELPER FUNCTION FOR IMPORT
 # ---------------------------
+_AI_SINGLETON = None
+
+
 def get_ai_recommendations(user_id, top_n=3):
-    ai = VillainAI()
-    return ai.get_popular_recommendations(user_id, top_n)
+    # Reuse one VillainAI so each recommendations call doesn't re-load the
+    # pickled model from disk
+    global _AI_SINGLETON
+    if _AI_SINGLETON is None:
+        _AI_SINGLETON = VillainAI()
+    return _AI_SINGLETON.get_popular_recommendations(user_id, top_n)
@@ -1,4 +1,13 @@
+import logging
+import logging.handlers
+import os
+import queue
+from threading import Thread
+
+import orjson
 from flask import Flask, render_template
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
 from config import Config
 
 # Import your routes
@@ -12,13 +21,26 @@ from routes.ai_routes import ai_bp
 from routes.security_routes import security_bp
 
 # Import database utils
-from utils.database import init_db
+from utils.database import init_db, init_app as init_db_teardown
 
 # Import AI for training on startup
 from ai.villain_ai import VillainAI
 from ai.data_collection import VillainDataset
 
 
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify through orjson: native datetime handling, bytes output.
+
+    Only dumps is overridden; loads stays on the stdlib so kwargs like
+    the session serializer's object_hook (tagged-value untagging) are
+    honored -- orjson.loads has no hook support and dropping it corrupts
+    flashed messages in the secure cookie.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=str).decode('utf-8')
+
+
 def register_blueprints(app):
     """Helper to register all blueprints in one place."""
     app.register_blueprint(auth_bp)
@@ -31,41 +53,103 @@ def register_blueprints(app):
     app.register_blueprint(security_bp)
 
 
+def _configure_logging():
+    """Route log records through a queue so emission is asynchronous.
+
+    Handlers run on the QueueListener's thread, keeping stdout flushes
+    off request/worker threads even during failure cascades.
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers):
+        return
+    log_queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(
+        '%(asctime)s %(levelname)s %(name)s: %(message)s'
+    ))
+    listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
+
+def _collect_and_train():
+    """Run the existing collect -> train -> save sequence."""
+    print("Initializing AI model...")
+    villain_ai = VillainAI()
+    dataset = VillainDataset()
+
+    # Try to collect real data, fallback to sample data
+    sales_data, interactions, menu_data = dataset.collect_real_data()
+    if sales_data is None or sales_data.empty:
+        print("No real data found, generating sample data for training...")
+        sales_data, interactions, menu_data = dataset.generate_sample_data()
+
+    # Train model if not already trained
+    if not villain_ai.is_trained and sales_data is not None and not sales_data.empty:
+        print("Training AI model...")
+        mae, rmse, feature_importance = villain_ai.train_sales_predictor(sales_data)
+        if mae is not None:
+            print(f"AI model trained successfully! MAE: {mae:.2f}, RMSE: {rmse:.2f}")
+        else:
+            print("AI model training failed, will retry on first use")
+    elif villain_ai.is_trained:
+        print("AI model already trained and loaded from disk")
+
+    # Pre-warm the shared popularity cache so the first dashboard hit
+    # doesn't pay the aggregate scan
+    villain_ai.get_popular_recommendations(top_n=10)
+
+
+def _train_if_needed():
+    """Train the sales model in the background, once per host.
+
+    Gunicorn boots several workers at once; a file lock makes sure only the
+    first one fits the model while the rest pick up the saved pickle.
+    """
+    try:
+        lock_path = Config.AI_MODEL_PATH + '.lock'
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        try:
+            import fcntl
+        except ImportError:
+            # No flock on this platform (Windows dev box): train unguarded
+            _collect_and_train()
+            return
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another worker may have finished training while we waited
+            if os.path.exists(Config.AI_MODEL_PATH):
+                print("AI model already trained by another worker")
+                return
+            _collect_and_train()
+    except Exception as e:
+        print(f"Error initializing AI model: {e}")
+        print("AI model will be trained on first use")
+
+
 def create_app(config_class=Config):
     """Flask application factory used by Gunicorn and tests."""
     flask_app = Flask(__name__)
     flask_app.config.from_object(config_class)
     flask_app.secret_key = config_class.SECRET_KEY  # Needed for sessions and flash
+    flask_app.json = OrjsonProvider(flask_app)  # jsonify everywhere uses orjson
+    Compress(flask_app)  # gzip/br for HTML and JSON bodies (see COMPRESS_* config)
+
+    _configure_logging()
 
     # Initialize database (test connection)
 
     init_db()
 
-    # Initialize and train AI model on startup
-    try:
-        print("Initializing AI model...")
-        villain_ai = VillainAI()
-        dataset = VillainDataset()
-        
-        # Try to collect real data, fallback to sample data
-        sales_data, interactions, menu_data = dataset.collect_real_data()
-        if sales_data is None or sales_data.empty:
-            print("No real data found, generating sample data for training...")
-            sales_data, interactions, menu_data = dataset.generate_sample_data()
-        
-        # Train model if not already trained
-        if not villain_ai.is_trained and sales_data is not None and not sales_data.empty:
-            print("Training AI model...")
-            mae, rmse, feature_importance = villain_ai.train_sales_predictor(sales_data)
-            if mae is not None:
-                print(f"AI model trained successfully! MAE: {mae:.2f}, RMSE: {rmse:.2f}")
-            else:
-                print("AI model training failed, will retry on first use")
-        elif villain_ai.is_trained:
-            print("AI model already trained and loaded from disk")
-    except Exception as e:
-        print(f"Error initializing AI model: {e}")
-        print("AI model will be trained on first use")
+    # Close request-scoped connections when the app context tears down
+    init_db_teardown(flask_app)
+
+    # Train the AI model off the startup path so worker boot only waits on
+    # init_db(); endpoints fall back to DB/sample paths until the model lands
+    Thread(target=_train_if_needed, daemon=True).start()
 
     # Register Blueprints
     register_blueprints(flask_app)
@@ -82,10 +166,8 @@ def create_app(config_class=Config):
     return flask_app
 
 
-# Default app instance for local development
-app = create_app()
-
-
-# Run the app
+# Run the app (production serving goes through wsgi.py so importing this
+# module never triggers init_db/model training as a side effect)
 if __name__ == '__main__':
+    app = create_app()
     app.run(debug=True)
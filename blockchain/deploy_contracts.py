@@ -6,17 +6,15 @@ Run this script to compile and deploy contracts
 import os
 import json
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from solcx import compile_standard, install_solc
 from blockchain.ethereum_integration import EthereumIntegration
 
 
 def compile_contract(contract_path: str, contract_name: str) -> dict:
-    """Compile Solidity contract"""
+    """Compile Solidity contract (solc 0.8.19 must already be installed)"""
     print(f"Compiling {contract_name}...")
-    
-    # Install Solidity compiler version
-    install_solc('0.8.19')
-    
+
     with open(contract_path, 'r') as f:
         source_code = f.read()
     
@@ -77,22 +75,26 @@ def main():
     print("-" * 60)
     
     try:
-        # Compile Order Contract
-        order_contract_data = compile_contract(
-            order_contract_path,
-            'VillainOrderContract'
-        )
+        # Install the Solidity compiler once, then compile both contracts
+        # concurrently -- solc runs as a subprocess, so the threads overlap
+        install_solc('0.8.19')
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            order_future = executor.submit(
+                compile_contract, order_contract_path, 'VillainOrderContract'
+            )
+            token_future = executor.submit(
+                compile_contract, token_contract_path, 'VillainToken'
+            )
+            order_contract_data = order_future.result()
+            token_contract_data = token_future.result()
+
         order_output = os.path.join(contracts_dir, 'VillainOrderContract.json')
         save_compiled_contract(order_contract_data, order_output)
-        
-        # Compile Token Contract
-        token_contract_data = compile_contract(
-            token_contract_path,
-            'VillainToken'
-        )
+
         token_output = os.path.join(contracts_dir, 'VillainToken.json')
         save_compiled_contract(token_contract_data, token_output)
-        
+
         print("\n✓ Contracts compiled successfully!")
         
     except Exception as e:
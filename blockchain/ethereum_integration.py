@@ -5,12 +5,70 @@ Handles Web3 interactions, contract deployment, and transaction management
 
 import os
 import json
+import functools
+import logging
+import importlib.resources
+import threading
+import time
+from decimal import Decimal
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional, Tuple, List
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from web3 import Web3
 from web3.middleware import geth_poa_middleware
 from eth_account import Account
 from config import Config
 
+logger = logging.getLogger(__name__)
+
+_WEI_PER_ETH = Decimal(10) ** 18
+
+# Hostname markers for chains that need the PoA extraData middleware;
+# mainnet/Sepolia must not pay its per-RPC wrapping cost
+POA_HOST_MARKERS = frozenset({'polygon', 'bsc', 'bnb', 'goerli', 'moonbeam', 'gnosis'})
+
+# keccak256 topic of OrderCreated, precomputed so receipts can be scanned
+# with a hash compare instead of a full ABI decode of every log
+ORDER_CREATED_TOPIC = Web3.keccak(
+    text='OrderCreated(uint256,address,address,uint256,uint256)'
+)
+
+
+def _needs_poa_middleware(network_url: str) -> bool:
+    """Decide whether the PoA middleware applies to this RPC endpoint.
+
+    The ETHEREUM_POA env var (1/0) overrides hostname detection.
+    """
+    override = os.environ.get('ETHEREUM_POA')
+    if override is not None:
+        return override not in ('0', 'false', 'False', '')
+    hostname = (urlparse(network_url).hostname or '').lower()
+    return any(marker in hostname for marker in POA_HOST_MARKERS)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_contract_json(path: str) -> dict:
+    """Parse a contract ABI/bytecode file once per process."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_contract_artifact(name: str) -> Optional[dict]:
+    """Load a packaged contract artifact (ABI + bytecode) once per process.
+
+    Goes through importlib.resources so it keeps working when the package
+    is distributed as a wheel or zipapp rather than loose files.
+    """
+    try:
+        resource = importlib.resources.files('blockchain') / 'contracts' / name
+        return json.loads(resource.read_text())
+    except (FileNotFoundError, ModuleNotFoundError):
+        return None
+
 
 class EthereumIntegration:
     """Handle Ethereum blockchain interactions"""
@@ -22,6 +80,15 @@ class EthereumIntegration:
         self.token_contract = None
         self.order_contract_address = None
         self.token_contract_address = None
+        self._connected = False
+        self._contract_cache: Dict[Tuple[str, str], object] = {}
+        self._create_order_fn = None
+        self._process_payment_fn = None
+        self._nonce_lock = threading.Lock()
+        self._nonce: Optional[int] = None
+        self._gas_price: Optional[int] = None
+        self._gas_price_at = 0.0
+        self._receipt_executor = ThreadPoolExecutor(max_workers=4)
         self._initialize_connection()
     
     def _initialize_connection(self):
@@ -31,32 +98,117 @@ class EthereumIntegration:
         private_key = os.environ.get('ETHEREUM_PRIVATE_KEY', '')
         
         try:
-            # Connect to Ethereum node
-            self.w3 = Web3(Web3.HTTPProvider(network_url))
+            # Connect to Ethereum node over a pooled keep-alive session so
+            # repeated RPCs reuse the TCP/TLS connection
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=10,
+                pool_maxsize=32,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.1,
+                    status_forcelist=[429, 502, 503, 504]
+                )
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self.w3 = Web3(Web3.HTTPProvider(
+                network_url, session=session, request_kwargs={'timeout': 15}
+            ))
             
-            # For PoA networks (like Polygon, BSC testnet)
-            if 'polygon' in network_url.lower() or 'bsc' in network_url.lower():
+            # For PoA networks (like Polygon, BSC testnet) only -- the
+            # middleware wraps every RPC, so non-PoA chains skip it
+            if _needs_poa_middleware(network_url):
                 self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
             
-            # Check connection
+            # Check connection once; afterwards is_connected() reads the
+            # cached flag instead of issuing an RPC per call
             if not self.w3.is_connected():
-                print("Warning: Could not connect to Ethereum network")
+                logger.warning("Could not connect to Ethereum network")
                 return
-            
+            self._connected = True
+
             # Set up account if private key provided
             if private_key:
                 self.account = Account.from_key(private_key)
-                print(f"Connected to Ethereum. Account: {self.account.address}")
+                logger.info("Connected to Ethereum. Account: %s", self.account.address)
             else:
-                print("No private key provided. Contract deployment disabled.")
+                logger.info("No private key provided. Contract deployment disabled.")
                 
         except Exception as e:
-            print(f"Error initializing Ethereum connection: {e}")
-            print("Falling back to local blockchain simulation")
+            logger.exception("Error initializing Ethereum connection")
+            logger.warning("Falling back to local blockchain simulation")
     
+    def _next_nonce(self) -> int:
+        """Return the next transaction nonce, tracked locally.
+
+        The node is only asked once (for its pending view); afterwards the
+        counter advances in-process, avoiding an RPC round-trip per
+        transaction and the nonce races a lagging pending view can cause.
+        """
+        with self._nonce_lock:
+            if self._nonce is None:
+                self._nonce = self.w3.eth.get_transaction_count(
+                    self.account.address, 'pending'
+                )
+            nonce = self._nonce
+            self._nonce += 1
+            return nonce
+
+    def _invalidate_nonce(self):
+        """Drop the cached nonce so the next transaction refetches it."""
+        with self._nonce_lock:
+            self._nonce = None
+
+    _GAS_PRICE_TTL = 30.0  # seconds
+
+    def _wait_for_receipt(self, tx_hash):
+        """Wait for a receipt on the shared executor.
+
+        Returns a future, so several in-flight transactions share their
+        block-time wait instead of stalling the worker serially.
+        """
+        return self._receipt_executor.submit(
+            self.w3.eth.wait_for_transaction_receipt, tx_hash
+        )
+
+    def _track_receipt(self, tx_hash):
+        """Resolve a submitted transaction's receipt in the background."""
+        def _on_done(future):
+            try:
+                receipt = future.result()
+                if receipt.status != 1:
+                    self._invalidate_nonce()
+                    logger.error("Transaction reverted: %s", tx_hash.hex())
+            except Exception as e:
+                self._invalidate_nonce()
+                logger.exception("Error waiting for receipt %s", tx_hash.hex())
+        self._wait_for_receipt(tx_hash).add_done_callback(_on_done)
+
+    def _prepare_tx_fields(self) -> Dict:
+        """Shared pre-flight fields for outbound transactions.
+
+        The nonce comes from the local cache and the gas price is refreshed
+        at most every _GAS_PRICE_TTL seconds, so building a transaction
+        normally costs zero RPC round-trips.
+        """
+        now = time.monotonic()
+        if self._gas_price is None or now - self._gas_price_at > self._GAS_PRICE_TTL:
+            self._gas_price = self.w3.eth.gas_price
+            self._gas_price_at = now
+        return {'nonce': self._next_nonce(), 'gasPrice': self._gas_price}
+
     def is_connected(self) -> bool:
-        """Check if connected to Ethereum network"""
-        return self.w3 is not None and self.w3.is_connected()
+        """Check if connected to Ethereum network (cached local flag)"""
+        if self.w3 is None:
+            return False
+        if not self._connected:
+            # Lazily re-probe so a node that came up late is picked up
+            try:
+                self._connected = self.w3.is_connected()
+            except Exception:
+                self._connected = False
+        return self._connected
     
     def get_balance(self, address: Optional[str] = None) -> float:
         """Get ETH balance for an address"""
@@ -72,46 +224,53 @@ class EthereumIntegration:
             balance_eth = self.w3.from_wei(balance_wei, 'ether')
             return float(balance_eth)
         except Exception as e:
-            print(f"Error getting balance: {e}")
+            logger.exception("Error getting balance")
             return 0.0
     
     def load_contract(self, contract_address: str, abi_path: str):
-        """Load a deployed contract"""
+        """Load a deployed contract, reusing instances across calls"""
         if not self.is_connected():
             return None
-        
+
+        cache_key = (contract_address, abi_path)
+        contract = self._contract_cache.get(cache_key)
+        if contract is not None:
+            return contract
+
         try:
-            with open(abi_path, 'r') as f:
-                abi = json.load(f)
-            
+            abi = _load_contract_json(abi_path)
+
             contract = self.w3.eth.contract(address=contract_address, abi=abi)
+            self._contract_cache[cache_key] = contract
             return contract
         except Exception as e:
-            print(f"Error loading contract: {e}")
+            logger.exception("Error loading contract")
             return None
+
+    def _bind_order_contract_fns(self):
+        """Pre-bind the hot contract functions once per loaded contract.
+
+        Looking the functions up per call makes web3 re-walk the ABI; the
+        bound attributes skip that introspection pass.
+        """
+        self._create_order_fn = self.order_contract.functions.createOrder
+        self._process_payment_fn = self.order_contract.functions.processPayment
     
     def deploy_order_contract(self) -> Optional[str]:
         """Deploy OrderContract to Ethereum"""
         if not self.is_connected() or not self.account:
-            print("Cannot deploy: Not connected or no account")
+            logger.error("Cannot deploy: Not connected or no account")
             return None
         
         try:
-            # Load contract bytecode and ABI
-            contract_path = os.path.join(
-                os.path.dirname(__file__),
-                'contracts',
-                'VillainOrderContract.json'
-            )
-            
-            if not os.path.exists(contract_path):
-                print(f"Contract file not found: {contract_path}")
-                print("Please compile the Solidity contract first")
+            # Load contract bytecode and ABI from the packaged artifact
+            contract_data = _load_contract_artifact('VillainOrderContract.json')
+
+            if contract_data is None:
+                logger.error("Contract artifact not found: VillainOrderContract.json; "
+                             "compile the Solidity contract first")
                 return None
-            
-            with open(contract_path, 'r') as f:
-                contract_data = json.load(f)
-            
+
             bytecode = contract_data['bytecode']
             abi = contract_data['abi']
             
@@ -121,9 +280,8 @@ class EthereumIntegration:
             # Build transaction
             transaction = contract.constructor().build_transaction({
                 'from': self.account.address,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
                 'gas': 3000000,
-                'gasPrice': self.w3.eth.gas_price
+                **self._prepare_tx_fields()
             })
             
             # Sign transaction
@@ -133,86 +291,111 @@ class EthereumIntegration:
             tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
             
             # Wait for receipt
-            tx_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            tx_receipt = self._wait_for_receipt(tx_hash).result()
             
             self.order_contract_address = tx_receipt.contractAddress
             self.order_contract = self.w3.eth.contract(
                 address=self.order_contract_address,
                 abi=abi
             )
-            
-            print(f"Order contract deployed at: {self.order_contract_address}")
+            self._bind_order_contract_fns()
+
+            logger.info("Order contract deployed at: %s", self.order_contract_address)
             return self.order_contract_address
             
         except Exception as e:
-            print(f"Error deploying order contract: {e}")
+            self._invalidate_nonce()
+            logger.exception("Error deploying order contract")
             return None
     
     def create_order_on_blockchain(
         self,
         restaurant_address: str,
         total_amount_wei: int,
-        delivery_address: str
+        delivery_address: str,
+        submit_only: bool = False
     ) -> Optional[int]:
-        """Create an order on Ethereum blockchain"""
+        """Create an order on Ethereum blockchain.
+
+        With submit_only=True the transaction hash is returned as soon as
+        the node accepts it; the receipt resolves on a background thread.
+        """
         if not self.is_connected() or not self.order_contract or not self.account:
             return None
         
         try:
+            if self._create_order_fn is None:
+                self._bind_order_contract_fns()
+
             # Build transaction
-            transaction = self.order_contract.functions.createOrder(
+            transaction = self._create_order_fn(
                 restaurant_address,
                 total_amount_wei,
                 delivery_address
             ).build_transaction({
                 'from': self.account.address,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
                 'gas': 200000,
-                'gasPrice': self.w3.eth.gas_price
+                **self._prepare_tx_fields()
             })
             
             # Sign and send
             signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
             tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
+
+            if submit_only:
+                self._track_receipt(tx_hash)
+                return tx_hash.hex()
+
             # Wait for receipt
-            tx_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            tx_receipt = self._wait_for_receipt(tx_hash).result()
             
-            # Get order ID from event
+            # Get order ID straight from the matching log's indexed topic --
+            # no per-log ABI decoding pass
             order_id = None
-            if tx_receipt.logs:
-                event = self.order_contract.events.OrderCreated().process_receipt(tx_receipt)
-                if event:
-                    order_id = event[0]['args']['orderId']
-            
+            for log in tx_receipt.logs:
+                if log['topics'] and bytes(log['topics'][0]) == ORDER_CREATED_TOPIC:
+                    order_id = int.from_bytes(log['topics'][1], 'big')
+                    break
+
             return order_id
             
         except Exception as e:
-            print(f"Error creating order on blockchain: {e}")
+            self._invalidate_nonce()
+            logger.exception("Error creating order on blockchain")
             return None
     
-    def process_payment(self, order_id: int, amount_wei: int) -> bool:
+    def process_payment(self, order_id: int, amount_wei: int, submit_only: bool = False) -> bool:
         """Process payment for an order using ETH"""
         if not self.is_connected() or not self.order_contract or not self.account:
             return False
         
         try:
-            transaction = self.order_contract.functions.processPayment(order_id).build_transaction({
+            if self._process_payment_fn is None:
+                self._bind_order_contract_fns()
+
+            transaction = self._process_payment_fn(order_id).build_transaction({
                 'from': self.account.address,
                 'value': amount_wei,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
                 'gas': 200000,
-                'gasPrice': self.w3.eth.gas_price
+                **self._prepare_tx_fields()
             })
             
             signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
             tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            tx_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            
+
+            if submit_only:
+                self._track_receipt(tx_hash)
+                return True
+
+            tx_receipt = self._wait_for_receipt(tx_hash).result()
+
+            if tx_receipt.status != 1:
+                self._invalidate_nonce()
             return tx_receipt.status == 1
-            
+
         except Exception as e:
-            print(f"Error processing payment: {e}")
+            self._invalidate_nonce()
+            logger.exception("Error processing payment")
             return False
     
     def get_order_status(self, order_id: int) -> Optional[Dict]:
@@ -233,22 +416,22 @@ class EthereumIntegration:
                 'isDelivered': order[7]
             }
         except Exception as e:
-            print(f"Error getting order status: {e}")
+            logger.exception("Error getting order status")
             return None
     
     def eth_to_wei(self, eth_amount: float) -> int:
-        """Convert ETH to Wei"""
-        if not self.is_connected():
-            return 0
-        return self.w3.to_wei(eth_amount, 'ether')
-    
+        """Convert ETH to Wei (pure math, no network needed)"""
+        return int(Decimal(str(eth_amount)) * _WEI_PER_ETH)
+
     def wei_to_eth(self, wei_amount: int) -> float:
-        """Convert Wei to ETH"""
-        if not self.is_connected():
-            return 0.0
-        return float(self.w3.from_wei(wei_amount, 'ether'))
+        """Convert Wei to ETH (pure math, no network needed)"""
+        return float(Decimal(wei_amount) / _WEI_PER_ETH)
 
 
-# Global instance
-ethereum = EthereumIntegration()
+# Shared instance, constructed lazily so importing this module does not
+# block on an RPC handshake (or its timeout) at startup
+@functools.cache
+def get_ethereum() -> EthereumIntegration:
+    """Return the process-wide EthereumIntegration, creating it on first use."""
+    return EthereumIntegration()
 
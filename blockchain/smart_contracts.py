@@ -6,17 +6,32 @@ Supports both local Python contracts and Ethereum Solidity contracts
 
 import hashlib
 import json
+import struct
+import time
+import numpy as np
+from operator import itemgetter
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from config import Config
 
-# Try to import Ethereum integration (optional)
+# Try to import Ethereum integration (optional). The connection itself is
+# established lazily on first use, never at import time.
 try:
-    from blockchain.ethereum_integration import ethereum
-    ETHEREUM_AVAILABLE = ethereum.is_connected() and Config.USE_ETHEREUM
+    from blockchain.ethereum_integration import get_ethereum
 except ImportError:
-    ETHEREUM_AVAILABLE = False
-    ethereum = None
+    get_ethereum = None
+
+
+def _resolve_ethereum():
+    """Return the connected Ethereum integration, or None.
+
+    Skips all network activity when USE_ETHEREUM is off or web3 is not
+    installed, so app startup never waits on an unreachable node.
+    """
+    if not Config.USE_ETHEREUM or get_ethereum is None:
+        return None
+    eth = get_ethereum()
+    return eth if eth.is_connected() else None
 
 
 class OrderSmartContract:
@@ -31,10 +46,11 @@ class OrderSmartContract:
         self.restaurant_id = order_data.get('restaurant_id')
         self.total_amount = order_data.get('total_amount', 0)
         self.items = order_data.get('items', [])
-        self.timestamp = order_data.get('timestamp', str(datetime.now()))
+        self.timestamp = order_data.get('timestamp') or str(datetime.now())
         self.status = 'pending'
         self.contract_hash = None
-    
+        self._sorted_items = None
+
     def validate_order(self) -> Tuple[bool, str]:
         """Validate order meets contract requirements"""
         if not self.order_id:
@@ -88,16 +104,30 @@ class OrderSmartContract:
     
     def calculate_contract_hash(self) -> str:
         """Calculate unique hash for this contract"""
+        if self.contract_hash is not None:
+            return self.contract_hash
+
+        if self._sorted_items is None:
+            try:
+                # itemgetter sorts at C speed; fall back if items lack the key
+                self._sorted_items = sorted(self.items, key=itemgetter('item_name'))
+            except KeyError:
+                self._sorted_items = sorted(self.items, key=lambda x: x.get('item_name', ''))
+
+        # Keys are listed pre-sorted so json.dumps does not have to re-sort
+        # every nested dict on each serialization
         contract_data = {
-            'order_id': self.order_id,
             'customer_id': self.customer_id,
+            'items': self._sorted_items,
+            'order_id': self.order_id,
             'restaurant_id': self.restaurant_id,
-            'total_amount': self.total_amount,
-            'items': sorted(self.items, key=lambda x: x.get('item_name', '')),
-            'timestamp': self.timestamp
+            'timestamp': self.timestamp,
+            'total_amount': self.total_amount
         }
-        contract_string = json.dumps(contract_data, sort_keys=True)
-        self.contract_hash = hashlib.sha256(contract_string.encode()).hexdigest()
+        # BLAKE2b is noticeably faster than SHA-256 on these short, local
+        # messages; compact separators avoid padding the hash input
+        contract_string = json.dumps(contract_data, separators=(',', ':'))
+        self.contract_hash = hashlib.blake2b(contract_string.encode(), digest_size=32).hexdigest()
         return self.contract_hash
     
     def to_dict(self) -> Dict:
@@ -110,7 +140,8 @@ class OrderSmartContract:
             'items': self.items,
             'timestamp': self.timestamp,
             'status': self.status,
-            'contract_hash': self.contract_hash or self.calculate_contract_hash()
+            # Memoized, so repeated serializations never re-hash
+            'contract_hash': self.calculate_contract_hash()
         }
 
 
@@ -120,13 +151,14 @@ class PaymentSmartContract:
     Handles payment verification and settlement
     """
     
-    def __init__(self, order_id: int, amount: float, payment_method: str):
+    def __init__(self, order_id: int, amount: float, payment_method: str,
+                 timestamp: Optional[str] = None):
         self.order_id = order_id
         self.amount = amount
         self.payment_method = payment_method
         self.status = 'pending'
         self.transaction_id = None
-        self.timestamp = str(datetime.now())
+        self.timestamp = timestamp or str(datetime.now())
     
     def verify_payment(self) -> Tuple[bool, str]:
         """Verify payment meets contract requirements"""
@@ -136,9 +168,17 @@ class PaymentSmartContract:
         if self.payment_method not in ['card', 'mpesa', 'cash']:
             return False, f"Invalid payment method: {payment_method}"
         
-        # Generate transaction ID
-        transaction_data = f"{self.order_id}_{self.amount}_{self.payment_method}_{self.timestamp}"
-        self.transaction_id = hashlib.sha256(transaction_data.encode()).hexdigest()[:16]
+        # Generate transaction ID, feeding fields straight into the hasher
+        # rather than formatting an intermediate string
+        h = hashlib.blake2b(digest_size=32)
+        h.update(str(self.order_id).encode('ascii'))
+        h.update(b'_')
+        h.update(struct.pack('>d', self.amount))
+        h.update(b'_')
+        h.update(self.payment_method.encode('ascii'))
+        h.update(b'_')
+        h.update(self.timestamp.encode())
+        self.transaction_id = h.hexdigest()[:16]
         
         return True, f"Payment verified. Transaction ID: {self.transaction_id}"
     
@@ -182,8 +222,13 @@ class DeliverySmartContract:
     
     def generate_verification_code(self) -> str:
         """Generate delivery verification code"""
-        code_data = f"{self.order_id}_{self.delivery_address}_{datetime.now()}"
-        self.verification_code = hashlib.sha256(code_data.encode()).hexdigest()[:8].upper()
+        h = hashlib.blake2b(digest_size=32)
+        h.update(str(self.order_id).encode('ascii'))
+        h.update(b'_')
+        h.update(self.delivery_address.encode())
+        h.update(b'_')
+        h.update(time.time_ns().to_bytes(8, 'big'))
+        self.verification_code = h.hexdigest()[:8].upper()
         return self.verification_code
     
     def update_delivery_status(self, new_status: str) -> Tuple[bool, str]:
@@ -232,6 +277,50 @@ class SmartContractExecutor:
     Supports both Ethereum Solidity contracts and local Python contracts
     """
     
+    @staticmethod
+    def validate_orders_batch(orders: List[Dict]) -> List[Tuple[bool, str]]:
+        """Validate item totals for many orders in one vectorized pass.
+
+        Flattens every order's items into structure-of-arrays form and
+        uses np.add.reduceat to compute per-order totals, replacing the
+        per-order Python loop when the admin flow validates in bulk.
+        """
+        if not orders:
+            return []
+
+        counts = [len(o.get('items', [])) for o in orders]
+        if min(counts) == 0:
+            # Fall back to the scalar path so empty-item orders get the
+            # same message validate_order would give
+            return [OrderSmartContract(o).validate_order() for o in orders]
+
+        prices = np.fromiter(
+            (i.get('price', 0) for o in orders for i in o['items']),
+            dtype=np.float64
+        )
+        qty = np.fromiter(
+            (i.get('quantity', 0) for o in orders for i in o['items']),
+            dtype=np.int32
+        )
+        offsets = np.cumsum(counts)
+        totals = np.add.reduceat(prices * qty, np.r_[0, offsets[:-1]])
+        expected = np.array([o.get('total_amount', 0) for o in orders], dtype=np.float64)
+        # Same absolute tolerance as the scalar check; np.isclose would
+        # add a relative term and accept mismatches on large totals
+        matches = np.abs(totals - expected) <= 0.01
+
+        results = []
+        for order, ok in zip(orders, matches):
+            if (ok and order.get('order_id') and order.get('customer_id')
+                    and order.get('restaurant_id')
+                    and order.get('total_amount', 0) > 0):
+                results.append((True, "Order validated successfully"))
+            else:
+                # Any failure re-runs the scalar validator so callers get
+                # byte-identical messages to validate_order
+                results.append(OrderSmartContract(order).validate_order())
+        return results
+
     @staticmethod
     def execute_order_contract(order_data: Dict, use_ethereum: bool = None) -> Tuple[bool, Dict, str]:
         """
@@ -244,11 +333,12 @@ class SmartContractExecutor:
         
         Returns: (success, result_dict, message)
         """
-        if use_ethereum is None:
-            use_ethereum = ETHEREUM_AVAILABLE
-        
+        # One timestamp per order execution, shared by every sub-contract
+        now_iso = str(datetime.now())
+        ethereum = _resolve_ethereum() if use_ethereum in (None, True) else None
+
         # If Ethereum is available and enabled, try to use it
-        if use_ethereum and ethereum and ethereum.is_connected():
+        if ethereum:
             try:
                 # Get restaurant address (should be stored in database)
                 restaurant_address = order_data.get('restaurant_address', '0x0000000000000000000000000000000000000000')
@@ -269,13 +359,14 @@ class SmartContractExecutor:
                         'blockchain': 'ethereum',
                         'contract_address': ethereum.order_contract_address,
                         'network': 'ethereum',
-                        'timestamp': str(datetime.now())
+                        'timestamp': now_iso
                     }, f"Order created on Ethereum blockchain. Order ID: {order_id}"
             except Exception as e:
                 print(f"Ethereum contract execution failed: {e}")
                 # Fall back to local contracts
         
         # Execute local Python contracts (fallback or default)
+        order_data.setdefault('timestamp', now_iso)
         contract = OrderSmartContract(order_data)
         
         # Validate order
@@ -288,7 +379,8 @@ class SmartContractExecutor:
         payment_contract = PaymentSmartContract(
             contract.order_id,
             contract.total_amount,
-            payment_method
+            payment_method,
+            timestamp=now_iso
         )
         
         payment_valid, payment_msg = payment_contract.verify_payment()
@@ -317,7 +409,7 @@ class SmartContractExecutor:
             'delivery_contract': delivery_contract.to_dict(),
             'contract_hash': contract_hash,
             'blockchain': 'local_python',
-            'execution_timestamp': str(datetime.now())
+            'execution_timestamp': now_iso
         }
         
         return True, result, "All smart contracts executed successfully"
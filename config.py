@@ -9,6 +9,14 @@ class Config:
     # Flask Config
     # --------------------------
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-me')
+    # Compact JSON everywhere, debug mode included; the export endpoint
+    # streams its own document so nothing needs pretty-printing
+    JSONIFY_PRETTYPRINT_REGULAR = False
+    # Response compression (flask-compress): HTML tables and JSON arrays
+    # shrink well; skip tiny bodies where the gzip header isn't worth it
+    COMPRESS_MIMETYPES = ['text/html', 'application/json']
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIN_SIZE = 500
     
     # --------------------------
     # MySQL Database Config
@@ -35,6 +43,7 @@ class Config:
     # AI & Blockchain Paths (optional)
     # --------------------------
     AI_MODEL_PATH = os.environ.get('AI_MODEL_PATH', os.path.join(basedir, 'ai', 'model.pkl'))
+    AI_TRAINING_WINDOW_DAYS = int(os.environ.get('AI_TRAINING_WINDOW_DAYS', 180))
     BLOCKCHAIN_LEDGER_PATH = os.environ.get('BLOCKCHAIN_LEDGER_PATH', os.path.join(basedir, 'blockchain', 'ledger.json'))
     AI_DATASET_PATH = os.environ.get('AI_DATASET_PATH', os.path.join(basedir, 'docs', 'ai', 'villain_sales_dataset.csv'))
     SECURITY_DOMAIN = os.environ.get('SECURITY_DOMAIN', 'https://security.villain-food-app.com')
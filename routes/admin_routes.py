@@ -1,40 +1,32 @@
-from flask import Blueprint, render_template, request, session, jsonify, flash, redirect, url_for
-from utils.database import get_db_connection
+from flask import Blueprint, render_template, stream_template, request, session, jsonify, flash, redirect, url_for
+from utils.database import get_request_connection
 from utils.security import admin_required
-from utils.blockchain import VillainBlockchain
+from utils.blockchain import get_blockchain
+from blockchain.smart_contracts import SmartContractExecutor
 
 admin_bp = Blueprint('admin', __name__)
-blockchain = VillainBlockchain()
+blockchain = get_blockchain()
 
 @admin_bp.route('/dashboard')
 @admin_required
 def dashboard():
     """Admin dashboard"""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
-        
-        # Get statistics
-        cursor.execute("SELECT COUNT(*) as total_users FROM users")
-        total_users = cursor.fetchone()
-        
-        cursor.execute("SELECT COUNT(*) as total_restaurants FROM restaurants")
-        total_restaurants = cursor.fetchone()
-        
-        cursor.execute("SELECT COUNT(*) as total_orders FROM orders")
-        total_orders = cursor.fetchone()
-        
-        cursor.execute("SELECT COALESCE(SUM(total_amount), 0) as total_revenue FROM orders WHERE status = 'delivered'")
-        total_revenue = cursor.fetchone()
-        
+
+        # Read the trigger-maintained counters -- O(1) regardless of how
+        # large users/orders grow
+        cursor.execute("SELECT metric, value FROM dashboard_stats")
+        stats = {row['metric']: row['value'] for row in cursor.fetchall()}
+
         cursor.close()
-        conn.close()
-        
+
         return render_template('admin/dashboard.html',
-                             total_users=total_users['total_users'],
-                             total_restaurants=total_restaurants['total_restaurants'],
-                             total_orders=total_orders['total_orders'],
-                             total_revenue=total_revenue['total_revenue'])
+                             total_users=int(stats.get('total_users', 0)),
+                             total_restaurants=int(stats.get('total_restaurants', 0)),
+                             total_orders=int(stats.get('total_orders', 0)),
+                             total_revenue=stats.get('total_revenue', 0))
     else:
         flash('Database connection error!', 'error')
         return render_template('admin/dashboard.html')
@@ -43,17 +35,24 @@ def dashboard():
 @admin_required
 def user_management():
     """User management"""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM users ORDER BY created_at DESC")
+
+        # Server-side pagination keeps memory bounded on large tables
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = 50
+        cursor.execute("SELECT * FROM users ORDER BY created_at DESC LIMIT %s OFFSET %s",
+                       (per_page + 1, (page - 1) * per_page))
         users = cursor.fetchall()
-        
+        has_next = len(users) > per_page
+        users = users[:per_page]
+
         cursor.close()
-        conn.close()
-        
-        return render_template('admin/user_management.html', users=users)
+
+        # stream_template starts sending HTML before the full page renders
+        return stream_template('admin/user_management.html', users=users,
+                               page=page, has_next=has_next)
     else:
         flash('Database connection error!', 'error')
         return render_template('admin/user_management.html')
@@ -62,22 +61,27 @@ def user_management():
 @admin_required
 def restaurant_management():
     """Restaurant management"""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
         
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = 50
         cursor.execute("""
-            SELECT r.*, u.name as owner_name 
-            FROM restaurants r 
-            JOIN users u ON r.owner_id = u.id 
+            SELECT r.*, u.name as owner_name
+            FROM restaurants r
+            JOIN users u ON r.owner_id = u.id
             ORDER BY r.created_at DESC
-        """)
+            LIMIT %s OFFSET %s
+        """, (per_page + 1, (page - 1) * per_page))
         restaurants = cursor.fetchall()
-        
+        has_next = len(restaurants) > per_page
+        restaurants = restaurants[:per_page]
+
         cursor.close()
-        conn.close()
-        
-        return render_template('admin/restaurant_management.html', restaurants=restaurants)
+
+        return stream_template('admin/restaurant_management.html', restaurants=restaurants,
+                               page=page, has_next=has_next)
     else:
         flash('Database connection error!', 'error')
         return render_template('admin/restaurant_management.html')
@@ -98,6 +102,51 @@ def blockchain_verify():
                          integrity=integrity,
                          message=message)
 
+@admin_bp.route('/orders/validate')
+@admin_required
+def orders_validate():
+    """Bulk-validate stored orders against the order contract rules"""
+    conn = get_request_connection()
+    if not conn:
+        return jsonify({'success': False, 'message': 'Database connection error'})
+
+    cursor = conn.cursor()
+    # One fan-out query; rows group back into per-order item lists below.
+    # LEFT JOIN so orders without items still show up -- the batch
+    # validator reports those as invalid rather than skipping them
+    cursor.execute("""
+        SELECT o.id, o.customer_id, o.restaurant_id,
+               CAST(o.total_amount AS REAL) as total_amount,
+               oi.price, oi.quantity
+        FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.id
+        ORDER BY o.id
+    """)
+    rows = cursor.fetchall()
+    cursor.close()
+
+    orders = []
+    for row in rows:
+        if not orders or orders[-1]['order_id'] != row['id']:
+            orders.append({
+                'order_id': row['id'],
+                'customer_id': row['customer_id'],
+                'restaurant_id': row['restaurant_id'],
+                'total_amount': row['total_amount'],
+                'items': []
+            })
+        if row['price'] is not None:
+            orders[-1]['items'].append({'price': row['price'],
+                                        'quantity': row['quantity']})
+
+    results = SmartContractExecutor.validate_orders_batch(orders)
+    invalid = [{'order_id': order['order_id'], 'message': message}
+               for order, (valid, message) in zip(orders, results) if not valid]
+
+    return jsonify({'success': True,
+                    'validated': len(orders),
+                    'invalid': invalid})
+
 @admin_bp.route('/ai-dashboard')
 @admin_required
 def ai_dashboard():
@@ -108,7 +157,7 @@ def ai_dashboard():
 @admin_required
 def menu_management():
     """Admin menu management - can manage menus for all restaurants"""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
         
@@ -122,15 +171,14 @@ def menu_management():
         selected_restaurant = None
         
         if restaurant_id:
-            cursor.execute("SELECT * FROM restaurants WHERE id = ?", (restaurant_id,))
+            cursor.execute("SELECT * FROM restaurants WHERE id = %s", (restaurant_id,))
             selected_restaurant = cursor.fetchone()
             
             if selected_restaurant:
-                cursor.execute("SELECT * FROM menu_items WHERE restaurant_id = ?", (restaurant_id,))
+                cursor.execute("SELECT * FROM menu_items WHERE restaurant_id = %s", (restaurant_id,))
                 menu_items = cursor.fetchall()
         
         cursor.close()
-        conn.close()
         
         return render_template('admin/menu_management.html',
                              restaurants=restaurants,
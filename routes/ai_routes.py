@@ -1,3 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
 from flask import Blueprint, render_template, jsonify
 from ai.villain_ai import VillainAI
 from ai.data_collection import VillainDataset
@@ -8,6 +11,61 @@ ai_bp = Blueprint('ai', __name__)
 villain_ai = VillainAI()
 dataset = VillainDataset()
 
+# Rendered chart HTML, reused until the orders table changes; plotly
+# serialization dominates dashboard latency otherwise
+_chart_cache = {'version': None, 'html': None}
+
+
+def _orders_version():
+    """Cheap stamp that changes whenever order data changes"""
+    try:
+        conn = get_db_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(id) AS max_id, COUNT(*) AS total FROM orders")
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            return (row['max_id'], row['total'])
+    except Exception as e:
+        print(f"Error reading orders version: {e}")
+    return None
+
+
+# Accuracy analysis refits on the learning curve, so it's the slowest
+# piece of the dashboard; keyed on the same orders version as the charts
+_accuracy_cache = {'version': None, 'result': None}
+
+
+def _model_accuracy(sales_data):
+    """Return analyze_model_accuracy output, cached per data version"""
+    version = _orders_version()
+    if version is not None and _accuracy_cache['version'] == version:
+        return _accuracy_cache['result']
+
+    result = villain_ai.analyze_model_accuracy(sales_data, include_learning_curve=True)
+    if version is not None:
+        _accuracy_cache['version'] = version
+        _accuracy_cache['result'] = result
+    return result
+
+
+def _rendered_charts(sales_data):
+    """Return the three dashboard charts as HTML, cached per data version"""
+    version = _orders_version()
+    if version is not None and _chart_cache['version'] == version:
+        return _chart_cache['html']
+
+    trend_chart, cuisine_chart, dow_chart = villain_ai.generate_ai_dashboard(sales_data)
+    html = (trend_chart.to_html(full_html=False, include_plotlyjs='cdn'),
+            cuisine_chart.to_html(full_html=False, include_plotlyjs=False),
+            dow_chart.to_html(full_html=False, include_plotlyjs=False))
+    if version is not None:
+        _chart_cache['version'] = version
+        _chart_cache['html'] = html
+    return html
+
+
 @ai_bp.route('/analytics')
 @admin_required
 def analytics_dashboard():
@@ -16,23 +74,24 @@ def analytics_dashboard():
     if sales_data is None:
         sales_data, interactions, menu_data = dataset.generate_sample_data()
     
-    # Train model if not trained
-    if not villain_ai.is_trained and sales_data is not None:
-        villain_ai.train_sales_predictor(sales_data)
-    
-    # Generate charts
-    trend_chart, cuisine_chart, dow_chart = villain_ai.generate_ai_dashboard(sales_data)
-    
-    # Get popular recommendations
-    popular_items = villain_ai.get_popular_recommendations(top_n=10)
-    
-    # Model accuracy analysis
-    accuracy_analysis = villain_ai.analyze_model_accuracy(sales_data)
-    
+    # Training happens in the startup background thread (app.py); here we
+    # only pick up a model another worker may have saved meanwhile
+    villain_ai._maybe_reload_model()
+
+    # Chart rendering, recommendations and accuracy analysis are
+    # independent, so they overlap on a small thread pool
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        charts_future = executor.submit(_rendered_charts, sales_data)
+        popular_future = executor.submit(villain_ai.get_popular_recommendations, None, 10)
+        accuracy_future = executor.submit(_model_accuracy, sales_data)
+        trend_html, cuisine_html, dow_html = charts_future.result()
+        popular_items = popular_future.result()
+        accuracy_analysis = accuracy_future.result()
+
     return render_template('admin/ai_dashboard.html',
-                         trend_chart=trend_chart.to_html(full_html=False, include_plotlyjs='cdn'),
-                         cuisine_chart=cuisine_chart.to_html(full_html=False, include_plotlyjs=False),
-                         dow_chart=dow_chart.to_html(full_html=False, include_plotlyjs=False),
+                         trend_chart=trend_html,
+                         cuisine_chart=cuisine_html,
+                         dow_chart=dow_html,
                          popular_items=popular_items,
                          accuracy_analysis=accuracy_analysis)
 
@@ -40,10 +99,8 @@ def analytics_dashboard():
 @restaurant_owner_required
 def restaurant_predictions(restaurant_id):
     """Sales predictions for specific restaurant"""
-    if not villain_ai.is_trained:
-        fallback_sales, _, _ = dataset.generate_sample_data()
-        villain_ai.train_sales_predictor(fallback_sales)
-
+    # No request-path training: the startup thread fits the model and
+    # predict_future_sales reloads it from disk once it lands
     predictions = villain_ai.predict_future_sales(restaurant_id, days=7)
     popular_items = villain_ai.get_popular_recommendations(top_n=5)
 
@@ -67,14 +124,36 @@ def restaurant_predictions(restaurant_id):
                          restaurant=restaurant,
                          restaurant_id=restaurant_id)
 
+# Single-flight guard for the public predictions API: concurrent calls
+# for the same restaurant share one in-flight model run instead of each
+# invoking the predictor (results then land in the TTL cache)
+_inflight_predictions = {}
+_inflight_lock = Lock()
+_prediction_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def _coalesced_predictions(restaurant_id):
+    """Run predict_future_sales once per restaurant at a time, sharing
+    the result with every caller that arrived while it was computing."""
+    with _inflight_lock:
+        future = _inflight_predictions.get(restaurant_id)
+        if future is None:
+            future = _prediction_executor.submit(
+                villain_ai.predict_future_sales, restaurant_id, 7
+            )
+            _inflight_predictions[restaurant_id] = future
+            future.add_done_callback(
+                lambda _f, rid=restaurant_id: _inflight_predictions.pop(rid, None)
+            )
+    return future.result()
+
+
 @ai_bp.route('/api/sales-predictions/<int:restaurant_id>')
 def api_sales_predictions(restaurant_id):
     """API endpoint for sales predictions"""
-    if not villain_ai.is_trained:
-        fallback_sales, _, _ = dataset.generate_sample_data()
-        villain_ai.train_sales_predictor(fallback_sales)
-
-    predictions = villain_ai.predict_future_sales(restaurant_id, days=7)
+    predictions = _coalesced_predictions(restaurant_id)
+    if not predictions and not villain_ai.is_trained:
+        return jsonify({'predictions': [], 'status': 'model warming up'}), 503
     return jsonify({'predictions': predictions})
 
 @ai_bp.route('/api/model-metrics')
@@ -85,6 +164,6 @@ def api_model_metrics():
     if sales_data is None:
         sales_data, interactions, menu_data = dataset.generate_sample_data()
     
-    accuracy_analysis = villain_ai.analyze_model_accuracy(sales_data)
-    
+    accuracy_analysis = _model_accuracy(sales_data)
+
     return jsonify(accuracy_analysis)
\ No newline at end of file
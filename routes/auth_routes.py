@@ -14,10 +14,18 @@ def login():
         conn = get_db_connection()
         if conn:
             cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+
+            # Narrow column list; users.email is UNIQUE so the lookup
+            # rides its implicit index and the row never leaves the page
+            # cache -- password verification is the only real cost here
+            cursor.execute(
+                "SELECT id, email, password_hash, role, name FROM users WHERE email = ?",
+                (email,)
+            )
             user = cursor.fetchone()
-            
+            cursor.close()
+            conn.close()
+
             if user and VillainSecurity.check_password(password, user['password_hash']):
                 # Login successful
                 session['user_id'] = user['id']
@@ -36,9 +44,6 @@ def login():
                     return redirect(url_for('admin.dashboard'))
             else:
                 flash('Invalid email or password!', 'error')
-            
-            cursor.close()
-            conn.close()
         else:
             flash('Database connection error!', 'error')
     
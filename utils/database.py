@@ -1,32 +1,72 @@
 import os
+import queue
+import re
 import sqlite3
+from functools import lru_cache
 from config import Config
 
+# Idle connections kept warm; leases beyond this open fresh connections
+# that are simply closed on release (overflow behaviour)
+POOL_SIZE = 10
+_pool = queue.Queue(maxsize=POOL_SIZE)
+
+# Ensure the data directory once at import instead of on every connect
+os.makedirs(os.path.dirname(Config.SQLITE_DB_PATH), exist_ok=True)
+
+# MySQL-isms still present in route SQL, rewritten for SQLite in one
+# regex pass; the cache means each distinct statement (they are all
+# static strings) is normalized exactly once per process
+_NORM_SUBS = {
+    '%s': '?',
+    'TRUE': '1',
+    'FALSE': '0',
+    'NOW()': 'CURRENT_TIMESTAMP',
+    'CURDATE()': "DATE('now')",
+}
+_NORM_RE = re.compile(r'%s|\bTRUE\b|\bFALSE\b|\bNOW\(\)|\bCURDATE\(\)')
+
+
+@lru_cache(maxsize=256)
+def _normalize_sql(query):
+    return _NORM_RE.sub(lambda match: _NORM_SUBS[match.group(0)], query)
+
+
+def _dict_row(cursor, row):
+    """Row factory building the dict rows routes expect, in one step.
+
+    Replaces the old sqlite3.Row fetch plus per-row dict(row) conversion:
+    one allocation per row instead of two.
+    """
+    return {description[0]: row[i]
+            for i, description in enumerate(cursor.description)}
+
 
 class SQLiteCursorWrapper:
+    __slots__ = ('_cursor',)
+
     def __init__(self, cursor):
         self._cursor = cursor
 
     def execute(self, query, params=None):
-        sql = self._normalize_query(query)
+        sql = _normalize_sql(query)
         parameters = params or []
         self._cursor.execute(sql, parameters)
         return self
 
     def executemany(self, query, seq_of_params):
-        sql = self._normalize_query(query)
+        sql = _normalize_sql(query)
         self._cursor.executemany(sql, seq_of_params)
         return self
 
+    # Rows arrive as dicts straight from _dict_row; nothing to convert
     def fetchone(self):
-        row = self._cursor.fetchone()
-        if row is None:
-            return None
-        return dict(row)
+        return self._cursor.fetchone()
 
     def fetchall(self):
-        rows = self._cursor.fetchall()
-        return [dict(row) for row in rows]
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
 
     def close(self):
         self._cursor.close()
@@ -35,17 +75,17 @@ class SQLiteCursorWrapper:
     def lastrowid(self):
         return self._cursor.lastrowid
 
-    def _normalize_query(self, query):
-        sql = query.replace('%s', '?')
-        sql = sql.replace('TRUE', '1').replace('FALSE', '0')
-        sql = sql.replace('NOW()', "CURRENT_TIMESTAMP")
-        sql = sql.replace('CURDATE()', "DATE('now')")
-        return sql
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
 
 
 class SQLiteConnectionWrapper:
-    def __init__(self, connection):
+    __slots__ = ('_connection', '_pooled')
+
+    def __init__(self, connection, pooled=False):
         self._connection = connection
+        self._pooled = pooled
 
     def cursor(self, dictionary=False):
         # dictionary flag retained for compatibility
@@ -58,26 +98,127 @@ class SQLiteConnectionWrapper:
         self._connection.rollback()
 
     def close(self):
-        self._connection.close()
+        # Pooled connections go back to the pool; callers keep the same
+        # conn.close() contract either way
+        if self._pooled:
+            _release_raw_connection(self._connection)
+        else:
+            self._connection.close()
+
+
+def _apply_pragmas(connection):
+    """Tune per-connection SQLite settings (idempotent, applied each open).
+
+    WAL + synchronous=NORMAL keeps commits from fsync-ing the main DB
+    file on every order/review write while staying crash-safe; temp
+    tables and a modest mmap window come along for read throughput.
+    """
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA busy_timeout=5000")
+    connection.execute("PRAGMA temp_store=MEMORY")
+    connection.execute("PRAGMA mmap_size=268435456")
+    # 8MB page cache (default is 2MB): keeps a user's order/review pages
+    # warm across the batched reads of the GDPR export and history scans
+    connection.execute("PRAGMA cache_size=-8192")
+
+
+def _new_raw_connection():
+    """Open a fresh SQLite connection configured for pooling"""
+    connection = sqlite3.connect(
+        Config.SQLITE_DB_PATH,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,
+        # Routes replay the same handful of statements per request; a
+        # larger cache keeps their prepared forms across the connection's
+        # pooled lifetime instead of re-parsing each time (default is 128)
+        cached_statements=512
+    )
+    connection.row_factory = _dict_row
+    _apply_pragmas(connection)
+    return connection
+
+
+def _lease_raw_connection():
+    """Take a connection from the pool, opening one if the pool is empty.
+
+    Pooled connections are pre-pinged so a stale handle (e.g. the DB file
+    was recreated) is replaced instead of surfacing as a request error.
+    """
+    while True:
+        try:
+            connection = _pool.get_nowait()
+        except queue.Empty:
+            return _new_raw_connection()
+        try:
+            connection.execute("SELECT 1")
+            return connection
+        except sqlite3.Error:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
 
-    def __getattr__(self, item):
-        return getattr(self._connection, item)
+
+def _release_raw_connection(connection):
+    """Return a connection to the pool, or close it when the pool is full"""
+    try:
+        connection.rollback()
+        _pool.put_nowait(connection)
+    except (sqlite3.Error, queue.Full):
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
 
 
 def get_db_connection(raw=False):
-    """Create and return SQLite database connection"""
+    """Lease a SQLite database connection from the pool.
+
+    Wrapped connections return to the pool on close(); raw connections
+    (schema work, scripts) bypass the pool and close for real.
+    """
     try:
-        os.makedirs(os.path.dirname(Config.SQLITE_DB_PATH), exist_ok=True)
-        connection = sqlite3.connect(Config.SQLITE_DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES)
-        connection.row_factory = sqlite3.Row
         if raw:
+            connection = sqlite3.connect(Config.SQLITE_DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES)
+            connection.row_factory = sqlite3.Row
+            _apply_pragmas(connection)
             return connection
-        return SQLiteConnectionWrapper(connection)
+        return SQLiteConnectionWrapper(_lease_raw_connection(), pooled=True)
     except sqlite3.Error as e:
         print(f"Database connection error: {e}")
         return None
 
 
+def get_request_connection():
+    """Return a connection shared for the whole current request.
+
+    Stored on Flask's g, so several queries in one view reuse a single
+    connection instead of opening and closing one per call. Closed by
+    close_request_connection at app-context teardown.
+    """
+    from flask import g
+    if 'db' not in g:
+        conn = get_db_connection()
+        if conn is None:
+            return None
+        g.db = conn
+    return g.db
+
+
+def close_request_connection(exception=None):
+    """Teardown handler: close the request-scoped connection, if any"""
+    from flask import g
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+
+def init_app(app):
+    """Register database teardown hooks on the Flask app"""
+    app.teardown_appcontext(close_request_connection)
+
+
 def init_db():
     """Initialize SQLite database with tables and sample data"""
     print("Initializing database...")
@@ -90,7 +231,9 @@ def init_db():
         cursor = conn.cursor()
         cursor.executescript(_schema_sql())
         ensure_schema_updates(cursor)
+        cursor.executescript(_index_sql())
         seed_sample_data(cursor)
+        refresh_dashboard_stats(cursor)
         conn.commit()
         print("Database ready at", Config.SQLITE_DB_PATH)
     except sqlite3.Error as e:
@@ -126,6 +269,7 @@ def _schema_sql():
         is_open INTEGER DEFAULT 1,
         delivery_time TEXT DEFAULT '30 mins',
         image_url TEXT,
+        menu_version INTEGER DEFAULT 0,
         created_at TEXT DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY(owner_id) REFERENCES users(id)
     );
@@ -153,6 +297,7 @@ def _schema_sql():
         delivery_address TEXT,
         special_instructions TEXT,
         payment_method TEXT DEFAULT 'cash',
+        blockchain_status TEXT DEFAULT 'pending',
         created_at TEXT DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY(customer_id) REFERENCES users(id),
         FOREIGN KEY(restaurant_id) REFERENCES restaurants(id)
@@ -188,116 +333,200 @@ def _schema_sql():
         block_data TEXT,
         timestamp TEXT DEFAULT CURRENT_TIMESTAMP
     );
+
+    CREATE TABLE IF NOT EXISTS dashboard_stats (
+        metric TEXT PRIMARY KEY,
+        value REAL NOT NULL DEFAULT 0
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_user_insert
+        AFTER INSERT ON users BEGIN
+        UPDATE dashboard_stats SET value = value + 1 WHERE metric = 'total_users';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_user_delete
+        AFTER DELETE ON users BEGIN
+        UPDATE dashboard_stats SET value = value - 1 WHERE metric = 'total_users';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_restaurant_insert
+        AFTER INSERT ON restaurants BEGIN
+        UPDATE dashboard_stats SET value = value + 1 WHERE metric = 'total_restaurants';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_restaurant_delete
+        AFTER DELETE ON restaurants BEGIN
+        UPDATE dashboard_stats SET value = value - 1 WHERE metric = 'total_restaurants';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_order_insert
+        AFTER INSERT ON orders BEGIN
+        UPDATE dashboard_stats SET value = value + 1 WHERE metric = 'total_orders';
+        UPDATE dashboard_stats SET value = value + (
+            CASE WHEN NEW.status = 'delivered' THEN NEW.total_amount ELSE 0 END
+        ) WHERE metric = 'total_revenue';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_order_delete
+        AFTER DELETE ON orders BEGIN
+        UPDATE dashboard_stats SET value = value - 1 WHERE metric = 'total_orders';
+        UPDATE dashboard_stats SET value = value - (
+            CASE WHEN OLD.status = 'delivered' THEN OLD.total_amount ELSE 0 END
+        ) WHERE metric = 'total_revenue';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_order_status
+        AFTER UPDATE OF status ON orders
+        WHEN NEW.status <> OLD.status BEGIN
+        UPDATE dashboard_stats SET value = value
+            + (CASE WHEN NEW.status = 'delivered' THEN NEW.total_amount ELSE 0 END)
+            - (CASE WHEN OLD.status = 'delivered' THEN OLD.total_amount ELSE 0 END)
+        WHERE metric = 'total_revenue';
+    END;
     """
 
 
+def _index_sql():
+    # Applied after ensure_schema_updates: some indexes cover migrated
+    # columns (e.g. reviews.restaurant_id), which a database created
+    # before the migrations does not have yet
+    return """
+    CREATE INDEX IF NOT EXISTS idx_orders_status_created
+        ON orders(status, created_at);
+
+    CREATE INDEX IF NOT EXISTS idx_menu_items_restaurant
+        ON menu_items(restaurant_id);
+
+    CREATE INDEX IF NOT EXISTS idx_menu_rest_avail
+        ON menu_items(restaurant_id, is_available, id);
+
+    CREATE INDEX IF NOT EXISTS idx_rest_approved_rating
+        ON restaurants(is_approved, rating DESC);
+
+    CREATE INDEX IF NOT EXISTS idx_orders_customer_created
+        ON orders(customer_id, created_at DESC);
+
+    CREATE INDEX IF NOT EXISTS idx_reviews_restaurant
+        ON reviews(restaurant_id, id DESC);
+
+    CREATE INDEX IF NOT EXISTS idx_orders_restaurant_status
+        ON orders(restaurant_id, status, created_at);
+
+    CREATE INDEX IF NOT EXISTS idx_restaurants_owner
+        ON restaurants(owner_id);
+
+    CREATE INDEX IF NOT EXISTS idx_orders_restaurant_created
+        ON orders(restaurant_id, created_at DESC);
+
+    CREATE INDEX IF NOT EXISTS idx_order_items_order
+        ON order_items(order_id);
+
+    CREATE INDEX IF NOT EXISTS idx_reviews_user
+        ON reviews(user_id);
+    """
+
+
+# Columns each table should end up with; ensure_schema_updates emits
+# ALTERs only for the missing ones. ALTER TABLE cannot attach DEFAULT
+# CURRENT_TIMESTAMP, hence the plain TEXT for reviews.created_at plus
+# the backfill below. orders.blockchain_status tracks the async
+# smart-contract recording; restaurants.menu_version backs the owner
+# views' ETags and is bumped on every menu item mutation.
+_WANTED_COLUMNS = {
+    'menu_items': {
+        'description': 'TEXT',
+        'is_vegetarian': 'INTEGER DEFAULT 0',
+        'is_spicy': 'INTEGER DEFAULT 0',
+    },
+    'reviews': {
+        'restaurant_id': 'INTEGER',
+        'created_at': 'TEXT',
+    },
+    'orders': {
+        'payment_method': "TEXT DEFAULT 'cash'",
+        'blockchain_status': "TEXT DEFAULT 'pending'",
+    },
+    'restaurants': {
+        'menu_version': 'INTEGER DEFAULT 0',
+    },
+}
+
+
 def ensure_schema_updates(cursor):
     """Handle lightweight schema migrations for SQLite."""
     try:
-        # Check and update menu_items table
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='menu_items'
-        """)
-        if cursor.fetchone():
-            cursor.execute("PRAGMA table_info(menu_items)")
+        # One sqlite_master pass for table existence, then a single
+        # table_info per table instead of interleaved checks
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        existing_tables = {row['name'] for row in cursor.fetchall()}
+
+        for table, wanted in _WANTED_COLUMNS.items():
+            if table not in existing_tables:
+                continue
+            cursor.execute(f"PRAGMA table_info({table})")
             rows = cursor.fetchall()
             # Handle both Row objects and tuples
             if rows and isinstance(rows[0], sqlite3.Row):
                 columns = {row['name'] for row in rows}
             else:
                 columns = {row[1] for row in rows}
-            
-            if 'description' not in columns:
-                try:
-                    cursor.execute("ALTER TABLE menu_items ADD COLUMN description TEXT")
-                except sqlite3.Error:
-                    pass
-            
-            if 'is_vegetarian' not in columns:
-                try:
-                    cursor.execute("ALTER TABLE menu_items ADD COLUMN is_vegetarian INTEGER DEFAULT 0")
-                except sqlite3.Error:
-                    pass
-            
-            if 'is_spicy' not in columns:
-                try:
-                    cursor.execute("ALTER TABLE menu_items ADD COLUMN is_spicy INTEGER DEFAULT 0")
-                except sqlite3.Error:
-                    pass
-        
-        # Check if reviews table exists
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='reviews'
-        """)
-        if cursor.fetchone():
-            # Get existing columns
-            cursor.execute("PRAGMA table_info(reviews)")
-            columns = {row['name']: row for row in cursor.fetchall()}
-            
-            # Add restaurant_id if missing
-            if 'restaurant_id' not in columns:
-                try:
-                    cursor.execute("ALTER TABLE reviews ADD COLUMN restaurant_id INTEGER")
-                except sqlite3.Error:
-                    pass  # Column might have been added concurrently
-            
-            # Add created_at if missing (without default - SQLite limitation with ALTER TABLE)
-            # Note: CREATE TABLE can use DEFAULT CURRENT_TIMESTAMP, but ALTER TABLE cannot
-            if 'created_at' not in columns:
-                try:
-                    cursor.execute("ALTER TABLE reviews ADD COLUMN created_at TEXT")
-                    # Update existing NULL values to current timestamp
-                    cursor.execute("UPDATE reviews SET created_at = datetime('now') WHERE created_at IS NULL")
-                except sqlite3.Error:
-                    pass  # Column might have been added concurrently
-        
-        # Check if orders table exists and add payment_method if missing
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='orders'
-        """)
-        if cursor.fetchone():
-            cursor.execute("PRAGMA table_info(orders)")
-            columns = {row['name']: row for row in cursor.fetchall()}
-            
-            if 'payment_method' not in columns:
+
+            for column, declaration in wanted.items():
+                if column in columns:
+                    continue
                 try:
-                    cursor.execute("ALTER TABLE orders ADD COLUMN payment_method TEXT DEFAULT 'cash'")
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
                 except sqlite3.Error:
                     pass  # Column might have been added concurrently
-                
-    except sqlite3.Error as e:
+
+            if table == 'reviews' and 'created_at' not in columns:
+                # Backfill rows that predate the created_at column
+                cursor.execute("UPDATE reviews SET created_at = datetime('now') WHERE created_at IS NULL")
+
+    except sqlite3.Error:
         # Ignore errors - table might not exist or columns might already exist
         pass
 
 
+def refresh_dashboard_stats(cursor):
+    """Re-seed the materialized dashboard counters from the base tables.
+
+    The triggers keep them current afterwards; re-running at startup
+    self-heals any drift (e.g. rows changed while triggers were absent).
+    """
+    cursor.execute("""
+        INSERT OR REPLACE INTO dashboard_stats (metric, value) VALUES
+            ('total_users', (SELECT COUNT(*) FROM users)),
+            ('total_restaurants', (SELECT COUNT(*) FROM restaurants)),
+            ('total_orders', (SELECT COUNT(*) FROM orders)),
+            ('total_revenue', (SELECT COALESCE(SUM(total_amount), 0)
+                               FROM orders WHERE status = 'delivered'))
+    """)
+
+
 def seed_sample_data(cursor):
     cursor.execute("SELECT COUNT(*) AS count FROM restaurants")
     if cursor.fetchone()['count'] > 0:
         return
 
-    restaurants = [
-        (None, 'Dark Knight Diner', 'Burger', 4.8, 1, 1, '25 mins', None),
-        (None, 'Villainous Vegan', 'Vegan', 4.4, 1, 1, '30 mins', None),
-        (None, 'Sinister Sushi', 'Asian', 4.6, 1, 1, '35 mins', None)
-    ]
-    cursor.executemany("""
+    # One statement per table: restaurants as a multi-row VALUES, menu
+    # items joined to their restaurant by name in SQL -- no id readback
+    # and Python-side lookup table in between
+    cursor.execute("""
         INSERT INTO restaurants (owner_id, name, cuisine_type, rating, is_approved, is_open, delivery_time, image_url)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, restaurants)
-
-    cursor.execute("SELECT id, name FROM restaurants")
-    restaurant_lookup = {row['name']: row['id'] for row in cursor.fetchall()}
-
-    menu_items = [
-        (restaurant_lookup['Dark Knight Diner'], 'Dark Knight Burger', 'Main', 14.99, 1),
-        (restaurant_lookup['Dark Knight Diner'], 'Gotham Fries', 'Side', 4.99, 1),
-        (restaurant_lookup['Villainous Vegan'], 'Evil Kale Bowl', 'Main', 12.50, 1),
-        (restaurant_lookup['Sinister Sushi'], 'Shadow Dragon Roll', 'Main', 16.75, 1)
-    ]
-    cursor.executemany("""
+        VALUES (NULL, 'Dark Knight Diner', 'Burger', 4.8, 1, 1, '25 mins', NULL),
+               (NULL, 'Villainous Vegan', 'Vegan', 4.4, 1, 1, '30 mins', NULL),
+               (NULL, 'Sinister Sushi', 'Asian', 4.6, 1, 1, '35 mins', NULL)
+    """)
+
+    cursor.execute("""
+        WITH seed(restaurant_name, name, category, price, is_available) AS (
+            VALUES ('Dark Knight Diner', 'Dark Knight Burger', 'Main', 14.99, 1),
+                   ('Dark Knight Diner', 'Gotham Fries', 'Side', 4.99, 1),
+                   ('Villainous Vegan', 'Evil Kale Bowl', 'Main', 12.50, 1),
+                   ('Sinister Sushi', 'Shadow Dragon Roll', 'Main', 16.75, 1)
+        )
         INSERT INTO menu_items (restaurant_id, name, category, price, is_available)
-        VALUES (?, ?, ?, ?, ?)
-    """, menu_items)
\ No newline at end of file
+        SELECT r.id, seed.name, seed.category, seed.price, seed.is_available
+        FROM seed JOIN restaurants r ON r.name = seed.restaurant_name
+    """)
\ No newline at end of file
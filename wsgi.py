@@ -0,0 +1,11 @@
+# wsgi.py
+
+"""WSGI entry point for Gunicorn.
+
+Run with --preload so create_app's startup work (init_db, AI model load)
+happens once in the master and workers fork with it already in memory.
+"""
+
+from app import create_app
+
+app = create_app()